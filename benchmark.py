@@ -0,0 +1,137 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from constants import WorkerConfig
+from fake_telegram import FakeTelegramServer
+from models import Database
+from sharding import ShardedIngress
+from typing import Callable
+
+BENCH_TOKEN = "123456:benchmark"
+
+
+class ScriptedCustomers:
+    """Play the customer side of the /order flow, answering every keyboard the bot sends."""
+
+    def __init__(self, submit:Callable[[list[dict]], None], chat_ids:list[int]) -> None:
+        self.submit = submit
+        self.pending = set(chat_ids)
+        self.started_at = {}
+        self.latencies = []
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._update_id = 0
+
+    def send(self, chat_id:int, text:str) -> None:
+        with self._lock:
+            self._update_id += 1
+            update_id = self._update_id
+        self.submit([{
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "username": f"customer{chat_id}"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Customer", "username": f"customer{chat_id}"},
+                "text": text,
+            },
+        }])
+
+    def begin(self) -> None:
+        for chat_id in sorted(self.pending):
+            self.started_at[chat_id] = time.perf_counter()
+            self.send(chat_id, "/order")
+
+    def on_request(self, method:str, params:dict) -> None:
+        chat_id = int(params.get("chat_id", 0))
+        if chat_id not in self.started_at:
+            return
+
+        if method == "sendPhoto":
+            # The payment QR code ends the ordering flow.
+            with self._lock:
+                if chat_id not in self.pending:
+                    return
+                self.pending.discard(chat_id)
+                self.latencies.append(time.perf_counter() - self.started_at[chat_id])
+                if not self.pending:
+                    self.done.set()
+        elif method == "sendMessage" and "reply_markup" in params:
+            keyboard = json.loads(params["reply_markup"])["keyboard"]
+            buttons = [button["text"] for row in keyboard for button in row]
+            self.send(chat_id, "No" if "No" in buttons else buttons[0])
+
+
+def run_benchmark(worker_count:int, customers:int, latency:float, lanes:int, timeout:float) -> dict:
+    """Place one order per customer through a sharded bot and measure throughput."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, "bench.db")
+        db = Database(db_file)
+        db.cursor.execute("UPDATE menu SET quantity = ?", (customers * 10,))
+        db.conn.commit()
+
+        server = FakeTelegramServer(latency=latency).start()
+        server.install()
+        config = WorkerConfig(
+            token=BENCH_TOKEN,
+            db_file=db_file,
+            admins=[],
+            admin_chat_ids=[],
+            lanes=lanes,
+            api_url=server.api_url,
+            file_url=server.file_url,
+            log_dir=tmp_dir,
+        )
+        ingress = ShardedIngress(worker_count, config)
+        ingress.start()
+
+        script = ScriptedCustomers(ingress.submit, list(range(1, customers + 1)))
+        server.on_request = script.on_request
+        start = time.perf_counter()
+        script.begin()
+        completed = script.done.wait(timeout)
+        elapsed = time.perf_counter() - start
+
+        ingress.stop()
+        server.stop()
+        orders = len(db.get_order_ids())
+        db.shutdown()
+
+    latencies = sorted(script.latencies)
+    return {
+        "workers": worker_count,
+        "orders": orders,
+        "completed": completed,
+        "seconds": elapsed,
+        "orders_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+        "api_calls": sum(server.calls.values()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark order throughput against worker process count")
+    parser.add_argument("-w", "--workers", help="Worker counts to compare", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("-c", "--customers", help="Customers placing one order each", type=int, default=200)
+    parser.add_argument("-l", "--latency-ms", help="Simulated Telegram API latency per call", type=float, default=20)
+    parser.add_argument("--lanes", help="Customer worker lanes per process", type=int, default=4)
+    parser.add_argument("--timeout", help="Give up on a run after this many seconds", type=float, default=300)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'workers':>7} {'orders':>6} {'seconds':>8} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'api calls':>9}")
+    for worker_count in args.workers:
+        result = run_benchmark(worker_count, args.customers, args.latency_ms / 1000, args.lanes, args.timeout)
+        print(
+            f"{result['workers']:>7} {result['orders']:>6} {result['seconds']:>8.2f} {result['orders_per_second']:>9.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['api_calls']:>9}"
+            + ("" if result["completed"] else "  (timed out)")
+        )
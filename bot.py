@@ -1,18 +1,32 @@
 import argparse
+import io
 import logging
 import os
 import signal
 import sys
 import telebot
 
-from constants import QR_CODE_FILE, AVAIL_CMDS, MENU_DETAILS, MENU_FLYER, LOGS_DIR, OrderStatus, UpdateStatusOption
+from buttery_bot import ButteryBot
+from cart import CartStore
+from constants import QR_CODE_FILE, AVAIL_CMDS, LOGS_DIR, MEMPROFILE_DEFAULT_SECONDS, PROFILE_DEFAULT_SECONDS, STATS_RECENT_WINDOWS, CartLine, OrderStatus, RenderedResponse, StatusChange, UpdateStatusOption, WorkerConfig
 from datetime import datetime
 from decimal import Decimal
-from dotenv import load_dotenv
+from dispatch import LaneDispatcher
+from eta import QUEUE_STATUSES, QueueEtaModel
+from export import EXPORT_FORMATS, export_orders
 from functools import wraps
+from idempotency import UpdateDeduplicator
+from menu_file import MenuFile, MenuWatcher
+from menu_matcher import MenuMatcher
 from models import Database
+from profiling import HandlerProfiler, MemoryProfiler
+from reaper import OrderReaper
+from recorder import UpdateRecorder
+from render_cache import ResponseCache
+from status_cache import OrderStatusCache
 from telebot import types
-from utils import parse_status, sanitise_username, status_transition
+from typing import Callable, Optional
+from utils import PhaseTimer, format_order_stats, parse_status, sanitise_username, status_transition
 
 
 def setup_logging(log_dir:str = LOGS_DIR, test_mode:bool = False) -> None:
@@ -25,7 +39,7 @@ def setup_logging(log_dir:str = LOGS_DIR, test_mode:bool = False) -> None:
     prefix = "test" if test_mode else "prod"
     log_filename = os.path.join(log_dir, f"{prefix}_{timestamp}.log")
 
-    log_format = "%(asctime)s [%(levelname)s] @ %(threadName)s - %(message)s"
+    log_format = "%(asctime)s [%(levelname)s] @ %(processName)s/%(threadName)s - %(message)s"
     
     logging.basicConfig(
         level = logging.INFO,
@@ -38,26 +52,114 @@ def setup_logging(log_dir:str = LOGS_DIR, test_mode:bool = False) -> None:
     logging.info("Logging is set up.")
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-t", "--test", help="Run in test mode", action="store_true")
-    args = parser.parse_args()
+def make_keyboard(*labels:str) -> str:
+    """Build a one-time reply keyboard with one button per row and serialise it once."""
+    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
+    for label in labels:
+        keyboard.add(types.KeyboardButton(label))
+    return keyboard.to_json()
 
-    setup_logging(test_mode=args.test)
-    load_dotenv()
 
-    mode = "test" if args.test else "production"
-    logging.info(f"Running bot in {mode} mode.")
- 
-    admins_str = os.getenv("ADMINS")
-    admins = admins_str.split(',') if admins_str else []
+def make_expiry_notifier(bot:telebot.TeleBot) -> Callable[[int, str, OrderStatus], None]:
+    """Build the reaper callback that tells customers their order expired."""
+    def notify_expired_order(order_id:int, chat_id:str, status:OrderStatus) -> None:
+        if not chat_id:
+            return
+        # Step handlers are stored under the integer chat id telebot reads from each message
+        bot.clear_step_handler_by_chat_id(int(chat_id))
+        bot.send_message(
+            chat_id,
+            f"Your order {order_id} has expired and was cancelled because it was left {status.display()} for too long. "
+            "Use /order to start again."
+        )
+    return notify_expired_order
+
+
+def make_status_notifier(bot:telebot.TeleBot) -> Callable[[StatusChange], None]:
+    """Build the status listener that tells customers whenever an admin moves their order."""
+    STATUS_MESSAGES = {
+        OrderStatus.Pending: "Your order {order_id} has been put on hold. Please contact buttery staff if this is unexpected.",
+        OrderStatus.AwaitingPayment: (
+            "Your order {order_id} has been moved back to awaiting payment. "
+            "Buttery staff will contact you if anything is missing from your payment."
+        ),
+        OrderStatus.InKitchen: "Your payment for order {order_id} is confirmed and it is now being prepared! 👨‍🍳",
+        OrderStatus.OrderReady: "Your order {order_id} is ready to collect!",
+        OrderStatus.OrderCollected: "Order {order_id} has been collected. Enjoy your food!",
+        OrderStatus.Cancelled: "Your order {order_id} has been cancelled. Please contact buttery staff if this is unexpected.",
+    }
+
+    def notify_status_change(change:StatusChange) -> None:
+        # Placing an order and expiring it already send their own messages
+        if change.previous is None or change.expired or not change.chat_id:
+            return
+        template = STATUS_MESSAGES.get(change.status, "Your order {order_id} is now {status}.")
+        bot.send_message(change.chat_id, template.format(order_id=change.order_id, status=change.status.display()))
+    return notify_status_change
+
+
+def create_bot(
+    token:str,
+    db:Database,
+    admins:list[str],
+    admin_chat_ids:list[str],
+    dispatcher:Optional[LaneDispatcher] = None,
+    deduplicator:Optional[UpdateDeduplicator] = None,
+    menu_file:Optional[MenuFile] = None,
+    recorder:Optional[UpdateRecorder] = None,
+    **kwargs
+) -> ButteryBot:
+    """Create the bot and register all message handlers."""
+    profiler = HandlerProfiler()
+    memory_profiler = MemoryProfiler()
+    bot = ButteryBot(
+        token, deduplicator=deduplicator, dispatcher=dispatcher, admins=admins, recorder=recorder, profiler=profiler, **kwargs
+    )
+    menu_file = menu_file or MenuFile()
+
+    responses = ResponseCache()
+    carts = CartStore()
+    statuses = OrderStatusCache(db)
+    matcher = MenuMatcher(db)
+    eta = QueueEtaModel(db)
+    db.add_status_listener(make_status_notifier(bot))
+    YES_NO_KEYBOARD = make_keyboard("Yes", "No")
+    QUANTITY_KEYBOARD = make_keyboard("1", "2")
+    UPDATE_STATUS_KEYBOARD = make_keyboard(*(option.value for option in UpdateStatusOption))
+
+    def send_rendered(chat_id:int, response:RenderedResponse) -> types.Message:
+        return bot.send_message(chat_id, response.text, reply_markup=response.reply_markup, parse_mode=response.parse_mode)
+
+    def render_help(is_admin:bool) -> RenderedResponse:
+        formatted_message = "⚙️ *Available Commands*\n"
+        for command in AVAIL_CMDS:
+            if is_admin or not command.admin_only:
+                formatted_message += f"{command.command} - {command.description}\n"
+        return RenderedResponse(formatted_message, parse_mode="Markdown")
 
-    admin_chat_ids_str = os.getenv("ADMIN_CHAT_IDS")
-    admin_chat_ids = admin_chat_ids_str.split(',') if admin_chat_ids_str else []
+    def get_active_menu(version:int) -> list:
+        """Active menu items, read from the database only after the menu changes."""
+        return responses.get("menu_items", db.get_menu, version)
 
-    db = Database(test_mode=args.test)
-    bot = telebot.TeleBot(os.getenv("TOKEN"))
+    def render_menu(version:int) -> RenderedResponse:
+        menu = get_active_menu(version)
+        formatted_message = "📋 *Menu Items*\n"
+        for item in menu:
+            formatted_message += f"• {item.name}  (${item.price:.2f})\n"
+        return RenderedResponse(formatted_message, parse_mode="Markdown")
+
+    def render_order_keyboard(items:list) -> RenderedResponse:
+        return RenderedResponse(
+            "📋 *Make Order*\nPlease select an item from the keyboard:",
+            reply_markup=make_keyboard(*(f"{item.name} - ${item.price:.2f}" for item in items)),
+            parse_mode="Markdown"
+        )
 
+    def render_reduce_keyboard() -> RenderedResponse:
+        return RenderedResponse(
+            "Please select the menu item you want to reduce the quantity of.",
+            reply_markup=make_keyboard(*(f"{item.name} - {item.quantity} nos" for item in db.get_menu()))
+        )
 
     # Bot message handlers
     @bot.message_handler(commands=["start"])
@@ -74,26 +176,21 @@ if __name__ == "__main__":
 
     @bot.message_handler(commands=["help"])
     def help(message: types.Message) -> None:
-        formatted_message = "⚙️ *Available Commands*\n"
-        for command in AVAIL_CMDS:
-            if message.chat.username in admins or not command.admin_only:
-                formatted_message += f"{command.command} - {command.description}\n"
-        bot.send_message(message.chat.id, formatted_message, parse_mode="Markdown")
+        is_admin = message.chat.username in admins
+        send_rendered(message.chat.id, responses.get(("help", is_admin), lambda: render_help(is_admin)))
 
     @bot.message_handler(commands=["menu"])
     def show_menu(message:types.Message) -> None:
         chat_id = message.chat.id
-        menu = db.get_menu()
-        formatted_message = "📋 *Menu Items*\n"
-        for item in menu:
-            formatted_message += f"• {item.name}  (${item.price:.2f})\n"
-        bot.send_message(chat_id, formatted_message, parse_mode="Markdown")
+        version = db.menu_version
+        send_rendered(chat_id, responses.get("menu", lambda: render_menu(version), version))
 
-        if MENU_FLYER:
-            with open(MENU_FLYER, "rb") as photo:
+        menu = menu_file.load()
+        if menu.flyer:
+            with open(menu.flyer, "rb") as photo:
                 bot.send_photo(chat_id, photo)
-        if MENU_DETAILS:
-            bot.send_message(chat_id, MENU_DETAILS, parse_mode="Markdown")
+        if menu.details:
+            bot.send_message(chat_id, menu.details, parse_mode="Markdown")
 
     @bot.message_handler(commands=["order"])
     def make_order(message:types.Message) -> None:
@@ -103,23 +200,45 @@ if __name__ == "__main__":
             bot.send_message(message.chat.id, "Sorry, you already have an order. Please contact buttery staff for assistance.")
             return
 
-        formatted_message = "📋 *Make Order*\nPlease select an item from the keyboard:"
-        
-        unselected_items = db.get_unselected_menu_item_names_by_username(username)
+        # Handlers also come back here with the customer's reply, so only /order itself can carry items
+        command, _, order_text = (message.text or "").partition(" ")
+        if command.startswith("/order") and order_text.strip():
+            return place_quick_order(message, order_text)
+
+        selected_ids = {line.menu_id for line in carts.get(message.chat.id)}
+        version = db.menu_version
+        unselected_items = [item for item in get_active_menu(version) if item.id not in selected_ids]
         final = len(unselected_items) == 1
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        for item in unselected_items:
-            button = types.KeyboardButton(f"{item.name} - ${item.price:.2f}")
-            keyboard.add(button)
+        keyboard_key = ("order", tuple(item.id for item in unselected_items))
+        response = responses.get(keyboard_key, lambda: render_order_keyboard(unselected_items), version)
 
-        msg = bot.send_message(
-            message.chat.id,
-            formatted_message,
-            reply_markup=keyboard,
-            parse_mode="Markdown"
-        )
+        msg = send_rendered(message.chat.id, response)
         bot.register_next_step_handler(msg, handle_item_selection, final)
 
+    def place_quick_order(message:types.Message, order_text:str) -> None:
+        parsed = matcher.parse_order(order_text)
+        problems = [f"• I couldn't find \"{query}\" on the menu." for query in parsed.unknown]
+        problems += [
+            f"• \"{query}\" could be {' or '.join(item.name for item in candidates)}."
+            for query, candidates in parsed.ambiguous
+        ]
+        problems += [f"• Please order at least 1 {item.name}." for item, quantity in parsed.lines if quantity <= 0]
+        if problems or not parsed.lines:
+            bot.send_message(
+                message.chat.id,
+                "Sorry, I couldn't place that order:\n" + "\n".join(problems) +
+                "\n\nTry something like /order 2 alfredo fresh, 1 shrimp, or just /order to choose from the menu."
+            )
+            return
+
+        # A one-shot order replaces anything picked so far with the keyboards
+        carts.clear(message.chat.id)
+        lines = [
+            CartLine(menu_id=item.id, name=item.name, price=item.price, quantity=quantity)
+            for item, quantity in parsed.lines
+        ]
+        place_and_finalise(message.chat.id, message.chat.username, lines)
+
     def handle_item_selection(message:types.Message, final:bool) -> None:
         split_message = message.text.split(" - ")
         if len(split_message) != 2:
@@ -134,13 +253,10 @@ if __name__ == "__main__":
             bot.send_message(message.chat.id, "Please try again with an existing menu item.")
             return
 
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        keyboard.add(types.KeyboardButton("1"), types.KeyboardButton("2"))
-
         msg = bot.send_message(
             message.chat.id,
             f"How many {item.name}(s) would you like to order? (Price per item: ${item.price:.2f})",
-            reply_markup=keyboard
+            reply_markup=QUANTITY_KEYBOARD
         )
         bot.register_next_step_handler(msg, handle_quantity_input, item.id, final)
 
@@ -152,13 +268,10 @@ if __name__ == "__main__":
             make_order(message)
             return
 
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        keyboard.add(types.KeyboardButton("Yes"), types.KeyboardButton("No"))
-
         chat_id = message.chat.id
         username = message.chat.username
-        success = db.insert_single_order(username, chat_id, item_id, quantity)
-        if not success:
+        item = db.get_menu_item_by_id(item_id)
+        if not item or quantity <= 0 or quantity + carts.get_quantity(chat_id, item_id) > item.quantity:
             bot.send_message(
                 chat_id,
                 "Sorry, we have run out of the item you selected. Please select a smaller quantity or choose another item."
@@ -166,14 +279,16 @@ if __name__ == "__main__":
             make_order(message)
             return
 
+        carts.add(chat_id, item, quantity)
+
         if final:
-            finalise_order(chat_id, username)
+            checkout(chat_id, username)
             return
 
         msg = bot.send_message(
             chat_id,
             "Would you like to add another item to your order? (Yes/No)",
-            reply_markup=keyboard
+            reply_markup=YES_NO_KEYBOARD
         )
         bot.register_next_step_handler(msg, handle_add_another_item)
 
@@ -181,33 +296,41 @@ if __name__ == "__main__":
         if message.text == "Yes":
             make_order(message)
         elif message.text == "No":
-            finalise_order(message.chat.id, message.chat.username)
+            checkout(message.chat.id, message.chat.username)
         else:
             logging.warning("Should be unreachable: handle_add_another_item with neither Yes or No.")
-            finalise_order(message.chat.id, message.chat.username)
+            checkout(message.chat.id, message.chat.username)
+
+    def checkout(chat_id:int, username:str) -> None:
+        lines = carts.get(chat_id)
+        if not lines:
+            bot.send_message(chat_id, "Your order has expired. Please use /order to start again.")
+            return
 
-    def finalise_order(chat_id:int, username:str) -> None:
-        pending_order_ids = db.get_pending_orders_for_username(username)
-        if len(pending_order_ids) != 1:
-            logging.warning("Should be unreachable: finalise_order with multiple pending orders.")
+        carts.clear(chat_id)
+        place_and_finalise(chat_id, username, lines)
+
+    def place_and_finalise(chat_id:int, username:str, lines:list[CartLine]) -> None:
+        placed = db.place_order(username, chat_id, [(line.menu_id, line.quantity) for line in lines])
+        if placed.order_id is None:
+            sold_out = ", ".join(line.name for line in lines if line.menu_id in placed.unavailable)
+            bot.send_message(
+                chat_id,
+                f"Sorry, we have run out of {sold_out}. Please use /order to choose again."
+            )
             return
-        pending_order_id = pending_order_ids[0]
 
-        order_items = db.get_order_items_for_order_id(pending_order_id)
+        finalise_order(chat_id, placed.order_id, placed.lines)
+
+    def finalise_order(chat_id:int, order_id:int, lines:list[CartLine]) -> None:
         order_summary = "Your Order:\n"
         total_price = Decimal(0)
 
-        for order_item in order_items:
-            item = db.get_menu_item_by_id(order_item.menu_id)
-            if not item:
-                logging.warning("Should be unreachable: finalise_order with no item.")
-                bot.send_message(chat_id, "Please try again with an existing menu item.")
-                return
-
-            item_price = Decimal(item.price) * Decimal(order_item.quantity)
+        for line in lines:
+            item_price = Decimal(line.price) * Decimal(line.quantity)
             total_price += item_price
-            order_summary += f"{item.name} x {order_item.quantity} = ${item_price:.2f}\n"
-        order_summary += f"\nTotal: ${total_price:.2f}"        
+            order_summary += f"{line.name} x {line.quantity} = ${item_price:.2f}\n"
+        order_summary += f"\nTotal: ${total_price:.2f}"
 
         bot.send_message(chat_id, order_summary, parse_mode="Markdown")
         bot.send_message(
@@ -216,19 +339,29 @@ if __name__ == "__main__":
         )
         with open(QR_CODE_FILE, "rb") as photo:
             msg = bot.send_photo(chat_id, photo)
-        
-        db.update_order_status(pending_order_id, OrderStatus.AwaitingPayment)
-        bot.register_next_step_handler(msg, send_notification_after_payment, order_item.order_id, total_price)
+
+        bot.register_next_step_handler(msg, send_notification_after_payment, order_id, total_price)
 
     def send_notification_after_payment(message:types.Message, order_id:int, total_price:Decimal) -> None:
         if message.photo:
             file_id = message.photo[-1].file_id
         elif message.document:
             file_id = message.document.file_id
+        elif db.get_status_by_id(order_id) != OrderStatus.AwaitingPayment:
+            # The order expired or moved on, possibly in another process that could not clear this handler,
+            # so let the message through to the usual handlers (such as the /order the expiry message suggests)
+            bot.process_new_messages([message])
+            return
         else:
             msg = bot.send_message(message.chat.id, "Please send the screenshot image.")
             bot.register_next_step_handler(msg, send_notification_after_payment, order_id, total_price)
             return
+
+        # Recording the screenshot also keeps the reaper from expiring the order while admins confirm it
+        if not db.mark_order_paid(order_id):
+            bot.send_message(message.chat.id, "This order is no longer awaiting payment. Use /status to check it.")
+            return
+        eta.on_paid(order_id)
         
         file_path = bot.get_file(file_id).file_path
         photo_file = bot.download_file(file_path)
@@ -242,19 +375,31 @@ if __name__ == "__main__":
         wait_message = (
             "Your screenshot has been forwarded to the admin. "
             "Please wait while they confirm and prepare your order. "
-            "You’ll receive a message once it's ready for collection!"
+            "You’ll receive a message whenever your order moves along, up to when it's ready for collection!"
         )
         bot.send_message(message.chat.id, wait_message)
 
     @bot.message_handler(commands=["status"])
     def check_status(message:types.Message) -> None:
-        status = db.get_status_by_customer_name(message.chat.username)
-        if not status:
+        latest = statuses.latest(message.chat.id)
+        if not latest.status:
             message_text = "You do not have an active order."
         else:
-            message_text = f"The status of your order is {status.display()}."
+            message_text = f"The status of your order is {latest.status.display()}."
+            if latest.status in QUEUE_STATUSES:
+                message_text += "\n" + describe_queue_position(latest.order_id, latest.status)
         bot.send_message(message.chat.id, message_text)
 
+    def describe_queue_position(order_id:int, status:OrderStatus) -> str:
+        ahead = eta.position(order_id, status)
+        if ahead is None and status == OrderStatus.AwaitingPayment:
+            return "Send your payment screenshot in this chat to join the payment queue."
+        ahead = ahead or 0
+        minutes = max(round(eta.estimate(status, ahead) / 60), 1)
+        if status == OrderStatus.InKitchen:
+            return f"You are number {ahead + 1} in the kitchen queue, so it should be ready in about {minutes} min."
+        return f"You are number {ahead + 1} in the payment queue, so it should be confirmed in about {minutes} min."
+
 
     # Admin only message handlers
     def admin_only(f):
@@ -298,12 +443,7 @@ if __name__ == "__main__":
     @bot.message_handler(commands=["updatestatus"])
     @admin_only
     def manage_orders(message:types.Message) -> None:
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        for option in UpdateStatusOption:
-            button = types.KeyboardButton(option.value)
-            keyboard.add(button)
-
-        msg = bot.send_message(message.chat.id, "What would you like to do?", reply_markup=keyboard)
+        msg = bot.send_message(message.chat.id, "What would you like to do?", reply_markup=UPDATE_STATUS_KEYBOARD)
         bot.register_next_step_handler(msg, handle_manage_order)
 
     def handle_manage_order(message:types.Message) -> None:
@@ -321,12 +461,10 @@ if __name__ == "__main__":
             case UpdateStatusOption.Any.value:
                 order_ids = db.get_order_ids()
 
-                keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-                keyboard.add(types.KeyboardButton("Yes"), types.KeyboardButton("No"))
                 msg = bot.send_message(
                     message.chat.id,
                     "Would you like to update the status for an order?",
-                    reply_markup=keyboard    
+                    reply_markup=YES_NO_KEYBOARD
                 )
                 bot.register_next_step_handler(msg, handle_update_status, order_ids, False)
 
@@ -347,12 +485,10 @@ if __name__ == "__main__":
             order_ids.append(order.order_id)
         bot.send_message(chat_id, formatted_message, parse_mode="Markdown")
 
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        keyboard.add(types.KeyboardButton("Yes"), types.KeyboardButton("No"))
         msg = bot.send_message(
             chat_id,
             "Would you like to update the status for any of these orders?",
-            reply_markup=keyboard    
+            reply_markup=YES_NO_KEYBOARD
         )
         bot.register_next_step_handler(msg, handle_update_status, order_ids, True)
      
@@ -407,41 +543,25 @@ if __name__ == "__main__":
 
     def handle_status_selection(message:types.Message, init_status:OrderStatus, order_id:int, restricted:bool) -> None:
         status = parse_status(message.text)
+        # The customer is notified by the status listener
         db.update_order_status(order_id, status)
 
         # TODO: check if order is moved to processing, then send message to cooks @rachel
-        if status == OrderStatus.OrderReady:
-            user_chat_id = db.get_chat_id_by_id(order_id)
-            bot.send_message(user_chat_id, "Your order is ready to collect!")
-
         bot.send_message(message.chat.id, f"Order ID {order_id} updated to {status.display()}")
 
         order_ids = db.get_order_ids_by_status(init_status)
 
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        keyboard.add(types.KeyboardButton("Yes"), types.KeyboardButton("No"))
         msg = bot.send_message(
             message.chat.id,
             "Would you like to update the status for another order?",
-            reply_markup=keyboard    
+            reply_markup=YES_NO_KEYBOARD
         )
         bot.register_next_step_handler(msg, handle_update_status, order_ids, restricted)
 
     @bot.message_handler(commands=["reducequantity"])
     @admin_only
     def reduce_menu_quantity(message:types.Message) -> None:
-        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        menu = db.get_menu()
-
-        for item in menu:
-            button = types.KeyboardButton(f"{item.name} - {item.quantity} nos")
-            keyboard.add(button)
-
-        msg = bot.send_message(
-            message.chat.id,
-            "Please select the menu item you want to reduce the quantity of.",
-            reply_markup=keyboard
-        )
+        msg = send_rendered(message.chat.id, responses.get("reduce", render_reduce_keyboard, db.stock_version))
         bot.register_next_step_handler(msg, handle_reduce_item_selection)
 
     def handle_reduce_item_selection(message:types.Message) -> None:
@@ -472,15 +592,185 @@ if __name__ == "__main__":
             db.reduce_menu_item_quantity(item_id, quantity)
         bot.send_message(message.chat.id, f"Menu item {item_id} quantity reduced by {quantity} nos.")
 
+    @bot.message_handler(commands=["export"])
+    @admin_only
+    def export_order_details(message:types.Message) -> None:
+        args = message.text.split()[1:]
+        fmt = args[0].lower() if args else "csv"
+        if fmt not in EXPORT_FORMATS:
+            bot.send_message(message.chat.id, f"Please choose one of: {', '.join(EXPORT_FORMATS)}.")
+            return
+
+        try:
+            output = export_orders(db, fmt)
+        except ImportError:
+            bot.send_message(message.chat.id, "XLSX export needs openpyxl installed, please use /export csv.")
+            return
+
+        with output:
+            file_name = f"orders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+            bot.send_document(message.chat.id, output, visible_file_name=file_name)
+        logging.info(f"Exported orders as {fmt} for {message.chat.username}.")
+
+    @bot.message_handler(commands=["orderstats"])
+    @admin_only
+    def show_order_stats(message:types.Message) -> None:
+        durations = db.get_status_durations()
+        windows = db.get_status_windows()
+        bot.send_message(message.chat.id, format_order_stats(durations, windows, max_windows=STATS_RECENT_WINDOWS))
+
+    def make_report_sender(chat_id:int, prefix:str) -> Callable[[str], None]:
+        def send_report(report:str) -> None:
+            file_name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            bot.send_document(chat_id, io.BytesIO(report.encode()), visible_file_name=file_name)
+        return send_report
+
+    @bot.message_handler(commands=["profile"])
+    @admin_only
+    def start_profile(message:types.Message) -> None:
+        args = message.text.split()[1:]
+        if args and (not args[0].isdigit() or int(args[0]) <= 0):
+            bot.send_message(message.chat.id, "Usage: /profile [seconds] or /profile N updates, with N above 0")
+            return
+
+        amount = int(args[0]) if args else PROFILE_DEFAULT_SECONDS
+        by_updates = len(args) > 1 and args[1].lower().startswith("update")
+        on_done = make_report_sender(message.chat.id, "profile")
+        if by_updates:
+            started = profiler.start(on_done, updates=amount)
+        else:
+            started = profiler.start(on_done, seconds=amount)
+
+        if not started:
+            bot.send_message(message.chat.id, "A profile is already running.")
+            return
+        target = f"the next {amount} updates" if by_updates else f"{amount} seconds"
+        bot.send_message(message.chat.id, f"Profiling handlers for {target}. The report will be sent here.")
+
+    @bot.message_handler(commands=["memprofile"])
+    @admin_only
+    def start_memory_profile(message:types.Message) -> None:
+        args = message.text.split()[1:]
+        if args and (not args[0].isdigit() or int(args[0]) <= 0):
+            bot.send_message(message.chat.id, "Usage: /memprofile [seconds], with seconds above 0")
+            return
+
+        seconds = int(args[0]) if args else MEMPROFILE_DEFAULT_SECONDS
+        if not memory_profiler.start(seconds, make_report_sender(message.chat.id, "memprofile")):
+            bot.send_message(message.chat.id, "Memory allocations are already being traced.")
+            return
+        bot.send_message(message.chat.id, f"Tracing memory allocations for {seconds} seconds. The report will be sent here.")
+
+    @bot.message_handler(commands=["lanestats"])
+    @admin_only
+    def show_lane_stats(message:types.Message) -> None:
+        if not dispatcher:
+            bot.send_message(message.chat.id, "Worker lanes are not enabled.")
+            return
+
+        formatted_message = "🚦 *Worker Lanes*\n"
+        for lane in dispatcher.stats():
+            formatted_message += (
+                f"{lane.name}: {lane.depth} queued (max {lane.max_depth}), "
+                f"{lane.completed}/{lane.submitted} done, {lane.failed} failed, {lane.full_waits} full waits\n"
+            )
+        bot.send_message(message.chat.id, formatted_message, parse_mode="Markdown")
+
+    return bot
+
+
+if __name__ == "__main__":
+    startup_timer = PhaseTimer()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--test", help="Run in test mode", action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of worker processes to shard updates across", type=int, default=1)
+    parser.add_argument("--webhook-port", help="Receive updates on this local port instead of polling (with --workers)", type=int)
+    parser.add_argument("--dashboard-port", help="Serve a live order dashboard on this local port", type=int)
+    parser.add_argument("--record", help="Append every incoming update to this JSONL file for replay.py", metavar="PATH")
+    args = parser.parse_args()
+
+    setup_logging(test_mode=args.test)
+    startup_timer.mark("logging")
+
+    # Only needed when running the bot directly, not when workers import create_bot
+    from dotenv import load_dotenv
+    load_dotenv()
+    startup_timer.mark("env")
+
+    mode = "test" if args.test else "production"
+    logging.info(f"Running bot in {mode} mode.")
+ 
+    admins_str = os.getenv("ADMINS")
+    admins = admins_str.split(',') if admins_str else []
+
+    admin_chat_ids_str = os.getenv("ADMIN_CHAT_IDS")
+    admin_chat_ids = admin_chat_ids_str.split(',') if admin_chat_ids_str else []
+
+    menu_file = MenuFile()
+    db = Database(test_mode=args.test, menu_items=menu_file.load().items)
+    startup_timer.mark(f"database ({db.startup_timer.report()})")
+    token = os.getenv("TOKEN")
+    recorder = UpdateRecorder(args.record) if args.record else None
+
+    if args.workers > 1:
+        from sharding import ShardedIngress
+
+        config = WorkerConfig(token=token, db_file=db.db_file, admins=admins, admin_chat_ids=admin_chat_ids, test_mode=args.test)
+        ingress = ShardedIngress(args.workers, config, deduplicator=UpdateDeduplicator(db), recorder=recorder)
+        reaper = OrderReaper(db, on_expired=make_expiry_notifier(telebot.TeleBot(token)))
+    else:
+        dispatcher = LaneDispatcher()
+        bot = create_bot(
+            token, db, admins, admin_chat_ids,
+            dispatcher=dispatcher, deduplicator=UpdateDeduplicator(db), menu_file=menu_file, recorder=recorder
+        )
+        reaper = OrderReaper(db, on_expired=make_expiry_notifier(bot))
+    startup_timer.mark("bot")
+
+    reaper.start()
+    startup_timer.mark("reaper")
+
+    dashboard = None
+    if args.dashboard_port:
+        from dashboard import Dashboard
+        dashboard = Dashboard(db, port=args.dashboard_port, watch_external=args.workers > 1).start()
+        startup_timer.mark("dashboard")
+
+    # Test mode uses its own menu, so only watch the menu file in production
+    menu_watcher = MenuWatcher(db, menu_file)
+    if not args.test:
+        menu_watcher.start()
+
     # Setup signal handling for graceful shutdown
     def graceful_shutdown(signal, frame):
         logging.info("Gracefully shutting down the bot...")
+        reaper.stop()
+        menu_watcher.stop()
+        if dashboard:
+            dashboard.stop()
+        if args.workers > 1:
+            ingress.stop()
+        else:
+            bot.stop_polling()
+            dispatcher.close()
+        if recorder:
+            recorder.close()
         db.shutdown()
-        bot.stop_polling()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, graceful_shutdown)  # Handle Ctrl+C
     signal.signal(signal.SIGTERM, graceful_shutdown)  # Handle termination signal (e.g., for systemd)
 
-    # TODO: convert to asynchronous polling, check database feasibility
-    bot.infinity_polling()
+    if args.workers > 1:
+        ingress.start()
+        startup_timer.mark("workers")
+        logging.info(f"Started in {startup_timer.total() * 1000:.0f}ms: {startup_timer.report()}")
+        if args.webhook_port:
+            ingress.serve_webhook("127.0.0.1", args.webhook_port)
+            signal.pause()
+        else:
+            ingress.poll_forever()
+    else:
+        logging.info(f"Started in {startup_timer.total() * 1000:.0f}ms: {startup_timer.report()}")
+        # TODO: convert to asynchronous polling, check database feasibility
+        bot.infinity_polling()
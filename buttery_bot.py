@@ -0,0 +1,80 @@
+import logging
+import telebot
+
+from dispatch import LaneDispatcher
+from idempotency import UpdateDeduplicator
+from profiling import HandlerProfiler
+from recorder import UpdateRecorder
+from telebot import apihelper, types
+from typing import Optional
+
+
+class ButteryBot(telebot.TeleBot):
+    """
+    TeleBot that drops updates which have already been processed and handles
+    each chat's updates on its own worker lane instead of the shared thread pool.
+    """
+
+    def __init__(
+        self,
+        token:str,
+        deduplicator:Optional[UpdateDeduplicator] = None,
+        dispatcher:Optional[LaneDispatcher] = None,
+        admins:Optional[list[str]] = None,
+        recorder:Optional[UpdateRecorder] = None,
+        profiler:Optional[HandlerProfiler] = None,
+        **kwargs
+    ) -> None:
+        super().__init__(token, **kwargs)
+        self.deduplicator = deduplicator
+        self.dispatcher = dispatcher
+        self.admins = set(admins or [])
+        self.recorder = recorder
+        self.profiler = profiler
+
+    def get_updates(self, offset=None, limit=None, timeout=20, allowed_updates=None, long_polling_timeout=20) -> list[types.Update]:
+        if not self.recorder:
+            return super().get_updates(offset, limit, timeout, allowed_updates, long_polling_timeout)
+
+        # Record the raw updates exactly as Telegram sent them, before any deduplication
+        json_updates = apihelper.get_updates(
+            self.token, offset=offset, limit=limit, timeout=timeout, allowed_updates=allowed_updates,
+            long_polling_timeout=long_polling_timeout)
+        self.recorder.record(json_updates)
+        return [types.Update.de_json(update) for update in json_updates]
+
+    def process_new_updates(self, updates:list[types.Update]) -> None:
+        if self.deduplicator:
+            fresh_updates = []
+            for update in updates:
+                if self.deduplicator.is_duplicate(update.update_id):
+                    logging.warning(f"Skipping already processed update {update.update_id}.")
+                    self.last_update_id = max(self.last_update_id, update.update_id)
+                    continue
+                fresh_updates.append(update)
+            updates = fresh_updates
+
+        if not self.dispatcher:
+            super().process_new_updates(updates)
+            return
+
+        # Route on the lane as well as handle there, so a next step handler registered
+        # by the previous update from the same chat is always in place.
+        for update in updates:
+            self.last_update_id = max(self.last_update_id, update.update_id)
+            message = update.message or update.edited_message
+            if message is None:
+                super().process_new_updates([update])
+                continue
+            chat = message.chat
+            self.dispatcher.dispatch(chat.id, chat.username in self.admins, super().process_new_updates, [update])
+
+    def _exec_task(self, task, *args, **kwargs):
+        if self.profiler and self.profiler.active:
+            task, args = self.profiler.profile, (task, *args)
+
+        if self.dispatcher:
+            # Already running on the chat's worker lane.
+            task(*args, **kwargs)
+        else:
+            super()._exec_task(task, *args, **kwargs)
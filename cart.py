@@ -0,0 +1,55 @@
+import threading
+import time
+
+from collections import OrderedDict
+from constants import CART_MAX_SESSIONS, CART_TTL_MINUTES, CartLine, MenuItem
+
+
+class CartStore:
+    """Bounded in-memory carts keyed by chat id that expire after a period of inactivity."""
+
+    def __init__(self, max_carts:int = CART_MAX_SESSIONS, ttl_minutes:float = CART_TTL_MINUTES) -> None:
+        self.max_carts = max_carts
+        self.ttl_seconds = ttl_minutes * 60
+        self._lock = threading.Lock()
+        # chat_id -> (last touched, menu_id -> line), least recently touched first
+        self._carts: OrderedDict[int, tuple[float, dict[int, CartLine]]] = OrderedDict()
+
+    def _evict(self, now:float) -> None:
+        while self._carts:
+            chat_id, (touched_at, _) = next(iter(self._carts.items()))
+            if now - touched_at < self.ttl_seconds and len(self._carts) <= self.max_carts:
+                break
+            del self._carts[chat_id]
+
+    def add(self, chat_id:int, item:MenuItem, quantity:int) -> list[CartLine]:
+        """Add quantity of a menu item to the chat's cart and return its lines."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            _, lines = self._carts.pop(chat_id, (now, {}))
+            existing = lines.get(item.id)
+            total = quantity + (existing.quantity if existing else 0)
+            lines[item.id] = CartLine(menu_id=item.id, name=item.name, price=item.price, quantity=total)
+            self._carts[chat_id] = (now, lines)
+            self._evict(now)
+            return list(lines.values())
+
+    def get(self, chat_id:int) -> list[CartLine]:
+        """Return the lines in the chat's cart, or an empty list if it has expired."""
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._carts.get(chat_id)
+            return list(entry[1].values()) if entry else []
+
+    def get_quantity(self, chat_id:int, menu_id:int) -> int:
+        """Return the quantity of a menu item already in the chat's cart."""
+        for line in self.get(chat_id):
+            if line.menu_id == menu_id:
+                return line.quantity
+        return 0
+
+    def clear(self, chat_id:int) -> None:
+        """Empty the chat's cart."""
+        with self._lock:
+            self._carts.pop(chat_id, None)
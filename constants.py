@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 DB_FILE = "buttery.db"
+DB_BUSY_TIMEOUT_SECONDS = 10
+SCHEMA_VERSION = 8 # bump whenever initialise() creates new tables, indexes or views
 
 QR_CODE_FILE = "qr_code.jpg"
 
@@ -15,9 +17,52 @@ MENU_ITEMS = [
 MENU_DETAILS = None # None or "additional details"
 MENU_FLYER = None # None or "image_path.jpg"
 
+# Menu definition that overrides the defaults above and is reloaded when edited
+MENU_FILE = "menu.toml"
+MENU_WATCH_INTERVAL_SECONDS = 2
+
 LOGS_DIR = "logs"
 ARCHIVE_DIR = "archive"
 
+AWAITING_PAYMENT_TIMEOUT_MINUTES = 30 # counted from entering AwaitingPayment, orders with a screenshot are never expired
+REAPER_INTERVAL_SECONDS = 60
+
+CART_TTL_MINUTES = 10
+CART_MAX_SESSIONS = 1000
+
+CUSTOMER_LANES = 4
+ADMIN_LANES = 1
+LANE_QUEUE_LIMIT = 100
+
+SHARD_QUEUE_LIMIT = 1000
+
+EXPORT_BATCH_SIZE = 500 # rows fetched from SQLite at a time
+EXPORT_SPOOL_BYTES = 1024 * 1024 # exports larger than this are spooled to a temp file
+
+PROFILE_DEFAULT_SECONDS = 30
+MEMPROFILE_DEFAULT_SECONDS = 60
+PROFILE_TOP_N = 30 # functions or allocation sites listed in a profile report
+TRACEMALLOC_FRAMES = 5
+
+ETA_EWMA_ALPHA = 0.3 # weight of the newest interval between orders leaving a queue
+ETA_IDLE_GAP_SECONDS = 10 * 60 # longer gaps mean the queue was empty and are not counted
+ETA_WARM_DEPARTURES = 20 # departures replayed from order_events on start-up
+ETA_REFRESH_SECONDS = 30 # how often sharded workers re-read departures made by other workers
+
+DASHBOARD_CLIENT_QUEUE_LIMIT = 100 # events buffered per browser before it is disconnected
+DASHBOARD_CHANGE_QUEUE_LIMIT = 1000 # changes waiting to be published before the page is told to reload instead
+DASHBOARD_KEEPALIVE_SECONDS = 15
+DASHBOARD_SEND_TIMEOUT_SECONDS = 30 # a browser that accepts nothing for this long is disconnected
+DASHBOARD_POLL_SECONDS = 1 # how often to check for commits by other processes, with --workers
+
+FUZZY_MATCH_CUTOFF = 0.75 # difflib similarity needed to accept a misspelt menu word
+
+STATS_WINDOW_MINUTES = 10 # bucket size for orders per window
+STATS_RECENT_WINDOWS = 12 # windows shown by /orderstats, older ones are in scripts.py stats
+
+PROCESSED_UPDATE_TTL_MINUTES = 24 * 60 # Telegram keeps undelivered updates for 24 hours
+PROCESSED_UPDATE_CAPACITY = 20000 # expected updates per TTL, sizes the Bloom filter
+
 class OrderStatus(Enum):
     Pending = "⏳ Pending"
     AwaitingPayment = "💳 Awaiting Payment"
@@ -35,6 +80,13 @@ class UpdateStatusOption(Enum):
     InKitchen = "Update InKitchen Orders"
     OrderReady = "Update OrderReady Orders"
     Any = "Update Any Order"
+
+
+# Seconds between orders leaving a queue, assumed until real departures are seen
+ETA_DEFAULT_INTERVAL_SECONDS = {
+    OrderStatus.AwaitingPayment: 60,
+    OrderStatus.InKitchen: 3 * 60,
+}
     
 
 class MenuItem(NamedTuple):
@@ -65,6 +117,115 @@ class OrderDetail(NamedTuple):
     order_contents: str
 
 
+class CartLine(NamedTuple):
+    menu_id: int
+    name: str
+    price: float
+    quantity: int
+
+
+class PlacedOrder(NamedTuple):
+    order_id: Optional[int]
+    lines: list[CartLine]
+    unavailable: list[int]
+
+
+class ExpiredOrders(NamedTuple):
+    orders: list[tuple[int, str]]
+    reclaimed_stock: dict[int, int]
+
+
+class StatusChange(NamedTuple):
+    order_id: int
+    chat_id: str
+    status: OrderStatus
+    previous: Optional[OrderStatus] = None # None for a newly placed order
+    expired: bool = False # cancelled by the reaper rather than an admin
+
+
+class MenuMatch(NamedTuple):
+    item: Optional[MenuItem]
+    candidates: list[MenuItem] # equally good matches when the query is ambiguous
+
+
+class ParsedOrder(NamedTuple):
+    lines: list[tuple[MenuItem, int]]
+    unknown: list[str]
+    ambiguous: list[tuple[str, list[MenuItem]]]
+
+
+class StockChange(NamedTuple):
+    menu_ids: Optional[list[int]] # None when the whole menu may have changed
+
+
+class CachedStatus(NamedTuple):
+    order_id: Optional[int]
+    status: Optional[OrderStatus]
+    version: int
+
+
+class MenuDefinition(NamedTuple):
+    items: list[tuple[str, int, float]]
+    details: Optional[str] = None
+    flyer: Optional[str] = None
+
+
+class RenderedResponse(NamedTuple):
+    text: str
+    reply_markup: Optional[str] = None # pre-serialised JSON
+    parse_mode: Optional[str] = None
+
+
+class LaneStats(NamedTuple):
+    name: str
+    depth: int
+    max_depth: int
+    submitted: int
+    completed: int
+    failed: int
+    full_waits: int
+
+
+class WorkerConfig(NamedTuple):
+    token: str
+    db_file: str
+    admins: list[str]
+    admin_chat_ids: list[str]
+    test_mode: bool = False
+    lanes: int = CUSTOMER_LANES
+    api_url: Optional[str] = None # override the Telegram API, e.g. for a local fake server
+    file_url: Optional[str] = None
+    log_dir: str = LOGS_DIR
+
+
+class OrderExportRow(NamedTuple):
+    order_id: int
+    customer_name: str
+    customer_chat_id: str
+    status: OrderStatus
+    created_at: str
+    item_name: str
+    quantity: int
+    price: float
+    line_total: float
+    order_total: float
+
+
+class StatusDuration(NamedTuple):
+    status: OrderStatus
+    orders: int
+    p50_seconds: float
+    p90_seconds: float
+    p95_seconds: float
+    max_seconds: float
+
+
+class StatusWindow(NamedTuple):
+    window_start: str
+    status: OrderStatus
+    orders: int
+
+
 class Command(NamedTuple):
     command: str
     description: str
@@ -74,12 +235,17 @@ AVAIL_CMDS : list[Command] = [
     Command(command="/start", description="Start the bot", admin_only=False),
     Command(command="/help", description="View commands", admin_only=False),
     Command(command="/menu", description="See the menu", admin_only=False),
-    Command(command="/order", description="Place your order", admin_only=False),
+    Command(command="/order", description="Place your order, or in one go with /order 2 alfredo fresh, 1 shrimp", admin_only=False),
     Command(command="/status", description="Check your order status", admin_only=False),
     
     Command(command="/listorders", description="List all orders", admin_only=True),
     Command(command="/toprocess", description="List orders to process", admin_only=True),
     Command(command="/updatestatus", description="Update order status", admin_only=True),
     Command(command="/reducequantity", description="Reduce menu item quantity", admin_only=True),
+    Command(command="/export", description="Export orders as CSV (or /export xlsx)", admin_only=True),
+    Command(command="/orderstats", description="Show time in each status and orders per window", admin_only=True),
+    Command(command="/profile", description="Profile handlers: /profile [seconds] or /profile N updates", admin_only=True),
+    Command(command="/memprofile", description="Trace memory growth for /memprofile [seconds]", admin_only=True),
+    Command(command="/lanestats", description="Show worker lane load", admin_only=True),
 ]
 
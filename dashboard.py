@@ -0,0 +1,298 @@
+import json
+import logging
+import queue
+import threading
+
+from constants import DASHBOARD_CHANGE_QUEUE_LIMIT, DASHBOARD_CLIENT_QUEUE_LIMIT, DASHBOARD_KEEPALIVE_SECONDS, DASHBOARD_POLL_SECONDS, DASHBOARD_SEND_TIMEOUT_SECONDS, MenuItem, OrderDetail, OrderStatus, StatusChange, StockChange
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models import Database
+from typing import Union
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Buttery Bot</title>
+<style>
+  body { font-family: sans-serif; margin: 1em; background: #fafafa; }
+  #board { display: flex; gap: 1em; align-items: flex-start; }
+  .column { flex: 1; background: #fff; border: 1px solid #ddd; border-radius: 6px; padding: 0.5em; }
+  .column h2 { font-size: 1em; margin: 0 0 0.5em; }
+  .order { border-top: 1px solid #eee; padding: 0.3em 0; }
+  .order.flash { background: #fff3c4; }
+  table { border-collapse: collapse; margin-top: 1em; }
+  td, th { border: 1px solid #ddd; padding: 0.2em 0.6em; text-align: left; }
+  #state { color: #888; }
+</style>
+</head>
+<body>
+<h1>Orders <small id="state">connecting...</small></h1>
+<div id="board"></div>
+<h1>Stock</h1>
+<table><thead><tr><th>Item</th><th>Left</th></tr></thead><tbody id="stock"></tbody></table>
+<script>
+const STATUSES = __STATUSES__;
+const board = document.getElementById("board");
+const stock = document.getElementById("stock");
+for (const [name, label] of STATUSES) {
+  board.insertAdjacentHTML("beforeend", `<div class="column" id="col-${name}"><h2>${label} (<span>0</span>)</h2></div>`);
+}
+
+function text(value) {
+  const span = document.createElement("span");
+  span.textContent = value;
+  return span.innerHTML;
+}
+
+function counts() {
+  for (const [name] of STATUSES) {
+    const column = document.getElementById(`col-${name}`);
+    column.querySelector("h2 span").textContent = column.querySelectorAll(".order").length;
+  }
+}
+
+function putOrder(order, flash) {
+  document.getElementById(`order-${order.id}`)?.remove();
+  const column = document.getElementById(`col-${order.status}`);
+  if (!column) return;
+  column.insertAdjacentHTML("beforeend",
+    `<div class="order" id="order-${order.id}"><b>${order.id}</b> @${text(order.customer)}<br>${text(order.contents)}</div>`);
+  if (flash) {
+    const card = document.getElementById(`order-${order.id}`);
+    card.classList.add("flash");
+    setTimeout(() => card.classList.remove("flash"), 2000);
+  }
+}
+
+function putStock(items, replace) {
+  if (replace) stock.innerHTML = "";
+  for (const item of items) {
+    document.getElementById(`item-${item.id}`)?.remove();
+    stock.insertAdjacentHTML("beforeend", `<tr id="item-${item.id}"><td>${text(item.name)}</td><td>${item.quantity}</td></tr>`);
+  }
+}
+
+async function load() {
+  const snapshot = await (await fetch("/snapshot")).json();
+  document.querySelectorAll(".order").forEach(card => card.remove());
+  snapshot.orders.forEach(order => putOrder(order, false));
+  putStock(snapshot.stock, true);
+  counts();
+}
+
+const events = new EventSource("/events");
+events.onopen = () => { document.getElementById("state").textContent = "live"; load(); };
+events.onerror = () => { document.getElementById("state").textContent = "reconnecting..."; };
+events.addEventListener("order", e => { putOrder(JSON.parse(e.data), true); counts(); });
+events.addEventListener("stock", e => { const data = JSON.parse(e.data); putStock(data.items, data.replace); });
+events.addEventListener("refresh", () => load());
+</script>
+</body>
+</html>
+"""
+
+
+def order_to_dict(order:OrderDetail) -> dict:
+    return {
+        "id": order.order_id,
+        "customer": order.customer_name,
+        "status": order.status.name if order.status else None,
+        "contents": order.order_contents,
+    }
+
+
+def menu_item_to_dict(item:MenuItem) -> dict:
+    return {"id": item.id, "name": item.name, "quantity": item.quantity}
+
+
+class Dashboard:
+    """
+    Local web page showing every order grouped by status and the stock left.
+
+    The page loads one snapshot and then receives a small server-sent event for
+    each status or stock change the bot commits. Changes are read back through a
+    separate read-only connection on the dashboard's own thread, and only while a
+    browser is connected. With watch_external, changes committed by other processes
+    (sharded workers) are noticed by polling the database's change counters instead,
+    and tell the page to reload its snapshot.
+    """
+
+    def __init__(self, db:Database, host:str = "127.0.0.1", port:int = 0, watch_external:bool = False) -> None:
+        self.db = db
+        self.watch_external = watch_external
+        self.reader = db.open_snapshot_reader()
+        self.events_sent = 0
+
+        self._changes = queue.Queue(maxsize=DASHBOARD_CHANGE_QUEUE_LIMIT)
+        self._changes_dropped = threading.Event()
+        self._clients: set[queue.Queue] = set()
+        self._clients_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        db.add_status_listener(self._on_change)
+        db.add_stock_listener(self._on_change)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "Dashboard":
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self.server.serve_forever, name="Dashboard", daemon=True),
+            threading.Thread(target=self._publish, name="DashboardPublisher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logging.info(f"Dashboard available at {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=DASHBOARD_KEEPALIVE_SECONDS)
+        self.reader.close()
+
+    def snapshot(self) -> dict:
+        orders, menu = self.reader.get_board()
+        return {"orders": [order_to_dict(order) for order in orders], "stock": [menu_item_to_dict(item) for item in menu]}
+
+    def _on_change(self, change:Union[StatusChange, StockChange]) -> None:
+        # Listeners run on the writing thread, so never wait for the publisher
+        try:
+            self._changes.put_nowait(change)
+        except queue.Full:
+            self._changes_dropped.set()
+
+    def _broadcast(self, event:str, data:dict) -> None:
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # A stalled browser is dropped rather than buffered without limit, it reloads on reconnect
+                self._remove_client(client)
+                self._close_client(client)
+        self.events_sent += 1
+
+    def _remove_client(self, client:queue.Queue) -> None:
+        with self._clients_lock:
+            self._clients.discard(client)
+
+    def _close_client(self, client:queue.Queue) -> None:
+        """Replace whatever the client has queued with the sentinel that ends its stream, without blocking."""
+        try:
+            while True:
+                client.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            client.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _publish(self) -> None:
+        """Turn committed changes into events, reading only the rows that changed."""
+        revisions = self.reader.revisions()
+        while not self._stop_event.is_set():
+            try:
+                change = self._changes.get(timeout=DASHBOARD_POLL_SECONDS)
+            except queue.Empty:
+                change = None
+            if self._stop_event.is_set():
+                break
+
+            try:
+                with self._clients_lock:
+                    has_clients = bool(self._clients)
+                if self._changes_dropped.is_set():
+                    # Too far behind to catch up change by change, so skip the backlog and reload
+                    self._changes_dropped.clear()
+                    while not self._changes.empty():
+                        self._changes.get_nowait()
+                    if has_clients:
+                        self._broadcast("refresh", {})
+                    continue
+                if not has_clients:
+                    continue
+                if isinstance(change, StatusChange):
+                    order = self.reader.get_order_detail(change.order_id)
+                    if order:
+                        self._broadcast("order", order_to_dict(order))
+                elif isinstance(change, StockChange):
+                    items = self.reader.get_menu_items(change.menu_ids)
+                    self._broadcast("stock", {"items": [menu_item_to_dict(item) for item in items], "replace": change.menu_ids is None})
+                elif self.watch_external:
+                    current = self.reader.revisions()
+                    if current != revisions:
+                        revisions = current
+                        self._broadcast("refresh", {})
+            except Exception as e:
+                logging.error(f"Dashboard failed to publish a change: {e}")
+
+    def _make_handler(self):
+        dashboard = self
+        page = DASHBOARD_PAGE.replace(
+            "__STATUSES__",
+            json.dumps([[status.name, status.display()] for status in OrderStatus if status != OrderStatus.Pending])
+        ).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            # Applied to the socket, so a write to a browser that stopped reading fails instead of blocking forever
+            timeout = DASHBOARD_SEND_TIMEOUT_SECONDS
+
+            def _reply(self, status:int, body:bytes, content_type:str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                if self.path == "/":
+                    self._reply(200, page, "text/html; charset=utf-8")
+                elif self.path == "/snapshot":
+                    self._reply(200, json.dumps(dashboard.snapshot()).encode(), "application/json")
+                elif self.path == "/events":
+                    self._stream_events()
+                else:
+                    self._reply(404, b"Not found", "text/plain")
+
+            def _stream_events(self) -> None:
+                client = queue.Queue(maxsize=DASHBOARD_CLIENT_QUEUE_LIMIT)
+                with dashboard._clients_lock:
+                    dashboard._clients.add(client)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                try:
+                    self.wfile.write(b"retry: 2000\n\n")
+                    self.wfile.flush()
+                    while not dashboard._stop_event.is_set():
+                        try:
+                            message = client.get(timeout=DASHBOARD_KEEPALIVE_SECONDS)
+                        except queue.Empty:
+                            message = b": keepalive\n\n"
+                        if message is None:
+                            break
+                        self.wfile.write(message)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError, TimeoutError):
+                    pass
+                finally:
+                    dashboard._remove_client(client)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+import traceback
+
+from constants import ADMIN_LANES, CUSTOMER_LANES, LANE_QUEUE_LIMIT, LaneStats
+from typing import Callable, Optional
+
+
+class WorkerLane:
+    """Single worker thread that runs its tasks strictly in submission order."""
+
+    def __init__(self, name:str, max_queue:int, on_error:Optional[Callable[[Exception], None]] = None) -> None:
+        self.name = name
+        self.on_error = on_error
+        self.tasks = queue.Queue(maxsize=max_queue)
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.full_waits = 0
+        self.max_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, task:Callable, *args, **kwargs) -> None:
+        """Queue a task, blocking the caller while the lane is full."""
+        try:
+            self.tasks.put_nowait((task, args, kwargs))
+        except queue.Full:
+            self.full_waits += 1
+            logging.debug(f"Lane {self.name} is full ({self.tasks.maxsize} tasks), applying backpressure.")
+            self.tasks.put((task, args, kwargs))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.tasks.qsize())
+
+    def _run(self) -> None:
+        while True:
+            item = self.tasks.get()
+            if item is None:
+                break
+            task, args, kwargs = item
+            try:
+                task(*args, **kwargs)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Task in lane {self.name} failed: {e}\n{traceback.format_exc()}")
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                self.tasks.task_done()
+
+    def stats(self) -> LaneStats:
+        return LaneStats(
+            name=self.name,
+            depth=self.tasks.qsize(),
+            max_depth=self.max_depth,
+            submitted=self.submitted,
+            completed=self.completed,
+            failed=self.failed,
+            full_waits=self.full_waits,
+        )
+
+    def close(self) -> None:
+        """Stop the lane once the tasks already queued have run."""
+        self.tasks.put(None)
+        self._thread.join()
+
+
+class LaneDispatcher:
+    """
+    Route tasks onto ordered worker lanes by chat id.
+
+    Every task for a chat lands on the same lane, so a customer's updates are
+    handled in the order they arrived without a global lock. Admin chats use
+    their own lanes so slow admin commands never hold up customers.
+    """
+
+    def __init__(
+        self,
+        customer_lanes:int = CUSTOMER_LANES,
+        admin_lanes:int = ADMIN_LANES,
+        max_queue:int = LANE_QUEUE_LIMIT,
+        on_error:Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        self.customer_lanes = [WorkerLane(f"CustomerLane-{i}", max_queue, on_error) for i in range(customer_lanes)]
+        self.admin_lanes = [WorkerLane(f"AdminLane-{i}", max_queue, on_error) for i in range(admin_lanes)]
+        logging.info(f"Started {customer_lanes} customer and {admin_lanes} admin worker lanes.")
+
+    def lane_for(self, chat_id:int, is_admin:bool) -> WorkerLane:
+        lanes = self.admin_lanes if is_admin and self.admin_lanes else self.customer_lanes
+        return lanes[hash(chat_id) % len(lanes)]
+
+    def dispatch(self, chat_id:int, is_admin:bool, task:Callable, *args, **kwargs) -> None:
+        self.lane_for(chat_id, is_admin).submit(task, *args, **kwargs)
+
+    def stats(self) -> list[LaneStats]:
+        return [lane.stats() for lane in self.admin_lanes + self.customer_lanes]
+
+    def close(self) -> None:
+        for lane in self.admin_lanes + self.customer_lanes:
+            lane.close()
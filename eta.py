@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+from constants import ETA_DEFAULT_INTERVAL_SECONDS, ETA_EWMA_ALPHA, ETA_IDLE_GAP_SECONDS, ETA_REFRESH_SECONDS, ETA_WARM_DEPARTURES, OrderStatus, StatusChange
+from models import Database
+from typing import Optional
+
+QUEUE_STATUSES = (OrderStatus.AwaitingPayment, OrderStatus.InKitchen)
+
+
+class QueueEtaModel:
+    """
+    Track the payment and kitchen queues and estimate waiting times from how often orders leave them.
+
+    Each departure from AwaitingPayment or InKitchen updates an exponentially
+    weighted moving average of the time between departures, so the estimate follows
+    recent throughput without rescanning any history. Gaps longer than
+    ETA_IDLE_GAP_SECONDS are treated as the queue having been empty, not slow, and
+    orders expired by the reaper are not counted as departures.
+
+    The queues themselves are kept in memory in line order by the status listener, so
+    a position is a dictionary scan. They are reloaded from the database only when
+    another process commits a status change or payment.
+    """
+
+    def __init__(self, db:Database, alpha:float = ETA_EWMA_ALPHA, idle_gap:float = ETA_IDLE_GAP_SECONDS) -> None:
+        self.db = db
+        self.alpha = alpha
+        self.idle_gap = idle_gap
+        self._lock = threading.Lock()
+        self._intervals: dict[OrderStatus, float] = {}
+        self._last_departure: dict[OrderStatus, float] = {}
+        self._refreshed_at = 0.0
+        self._queues: dict[OrderStatus, dict[int, None]] = {}
+        self._queues_version = None
+
+        self.warm()
+        self.load_queues()
+        db.add_status_listener(self.on_status_change)
+
+    def warm(self) -> None:
+        """Rebuild the averages from the latest departures in the order event log."""
+        intervals, last_departure = {}, {}
+        for status in QUEUE_STATUSES:
+            for departed_at in self.db.get_recent_departures(status, ETA_WARM_DEPARTURES):
+                self._observe(intervals, last_departure, status, departed_at)
+
+        with self._lock:
+            self._intervals, self._last_departure = intervals, last_departure
+            self._refreshed_at = time.monotonic()
+        logging.info(f"Queue ETA intervals: {', '.join(f'{status.name} {seconds:.0f}s' for status, seconds in intervals.items()) or 'no data yet'}.")
+
+    def load_queues(self) -> None:
+        """Reload the queues from the database, ranked the same way the listener keeps them."""
+        version = self.db.external_version
+        queues = {status: dict.fromkeys(self.db.get_queued_order_ids(status)) for status in QUEUE_STATUSES}
+        with self._lock:
+            self._queues, self._queues_version = queues, version
+
+    def _observe(self, intervals:dict, last_departure:dict, status:OrderStatus, departed_at:float) -> None:
+        previous = last_departure.get(status)
+        last_departure[status] = departed_at
+        if previous is None or not 0 <= departed_at - previous <= self.idle_gap:
+            return
+        interval = departed_at - previous
+        if status in intervals:
+            intervals[status] += self.alpha * (interval - intervals[status])
+        else:
+            intervals[status] = interval
+
+    def on_status_change(self, change:StatusChange) -> None:
+        with self._lock:
+            for queue in self._queues.values():
+                queue.pop(change.order_id, None)
+            if change.status == OrderStatus.InKitchen:
+                self._queues[OrderStatus.InKitchen][change.order_id] = None
+        # An order an admin sends back to AwaitingPayment keeps its payment, and with it its old place in line
+        if change.status == OrderStatus.AwaitingPayment and change.previous is not None:
+            self.load_queues()
+
+        # A reaper sweep cancels many orders at once, which says nothing about how fast the queue moves
+        if change.expired or change.previous not in QUEUE_STATUSES:
+            return
+        with self._lock:
+            self._observe(self._intervals, self._last_departure, change.previous, time.time())
+
+    def on_paid(self, order_id:int) -> None:
+        """Put an order at the back of the payment queue once its first screenshot arrives."""
+        with self._lock:
+            self._queues[OrderStatus.AwaitingPayment].setdefault(order_id, None)
+
+    def position(self, order_id:int, status:OrderStatus) -> Optional[int]:
+        """Number of orders ahead of this one in its queue, None if it is not in the queue (not paid yet)."""
+        if self.db.shared and self.db.external_version != self._queues_version:
+            self.load_queues()
+        with self._lock:
+            queue = self._queues.get(status, {})
+            if order_id not in queue:
+                return None
+            return list(queue).index(order_id)
+
+    def interval(self, status:OrderStatus) -> float:
+        """Current estimate of the seconds between two orders leaving a queue."""
+        # Admins in other worker processes move orders on too, so pick up their departures now and then
+        if self.db.shared and time.monotonic() - self._refreshed_at > ETA_REFRESH_SECONDS:
+            self.warm()
+        with self._lock:
+            return self._intervals.get(status, ETA_DEFAULT_INTERVAL_SECONDS[status])
+
+    def estimate(self, status:OrderStatus, ahead:int) -> Optional[float]:
+        """Seconds until an order with ahead orders in front of it leaves its queue."""
+        if status not in QUEUE_STATUSES:
+            return None
+        return (ahead + 1) * self.interval(status)
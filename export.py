@@ -0,0 +1,83 @@
+import csv
+import io
+import tempfile
+
+from constants import EXPORT_SPOOL_BYTES, OrderExportRow
+from models import Database
+from typing import IO, Iterable
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_HEADER = [
+    "Order ID",
+    "Customer",
+    "Chat ID",
+    "Status",
+    "Created At",
+    "Item",
+    "Quantity",
+    "Price",
+    "Line Total",
+    "Order Total",
+]
+
+
+def export_row_values(row:OrderExportRow) -> list:
+    return [
+        row.order_id,
+        row.customer_name,
+        row.customer_chat_id,
+        row.status.display() if row.status else "",
+        row.created_at,
+        row.item_name,
+        row.quantity,
+        row.price,
+        row.line_total,
+        row.order_total,
+    ]
+
+
+def write_orders_csv(rows:Iterable[OrderExportRow], stream:IO[bytes]) -> None:
+    """Write export rows as CSV to a binary stream one row at a time."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        writer.writerow(export_row_values(row))
+    text.flush()
+    text.detach() # leave the underlying stream open for the caller
+
+
+def write_orders_xlsx(rows:Iterable[OrderExportRow], stream:IO[bytes]) -> None:
+    """Write export rows as an XLSX workbook to a binary stream, using openpyxl's streaming writer."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Orders")
+    sheet.append(EXPORT_HEADER)
+    for row in rows:
+        sheet.append(export_row_values(row))
+    workbook.save(stream)
+
+
+def export_orders(db:Database, fmt:str = "csv") -> tempfile.SpooledTemporaryFile:
+    """
+    Export every order line to a file object positioned at the start.
+
+    Rows are streamed from the database in batches and written as they arrive, and
+    the output only moves from memory to a temporary file once it grows large.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    try:
+        rows = db.iter_order_export_rows()
+        if fmt == "xlsx":
+            write_orders_xlsx(rows, output)
+        else:
+            write_orders_csv(rows, output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import apihelper
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlparse
+
+FAKE_FILE_CONTENT = b"fake file"
+
+
+class FakeTelegramServer:
+    """
+    Local stand-in for the Telegram Bot API used by benchmarks and replays.
+
+    Every send* call is answered with a plausible Message, optionally after a fixed
+    latency, and reported to on_request so a driver can play the customer's side.
+    """
+
+    def __init__(
+        self,
+        host:str = "127.0.0.1",
+        port:int = 0,
+        latency:float = 0.0,
+        on_request:Optional[Callable[[str, dict], None]] = None,
+    ) -> None:
+        self.latency = latency
+        self.on_request = on_request
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._message_id = 0
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    @property
+    def file_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/file/bot{{0}}/{{1}}"
+
+    def install(self) -> None:
+        """Point telebot in this process at the fake server."""
+        apihelper.API_URL = self.api_url
+        apihelper.FILE_URL = self.file_url
+
+    def start(self) -> "FakeTelegramServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="FakeTelegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _next_message_id(self) -> int:
+        with self._lock:
+            self._message_id += 1
+            return self._message_id
+
+    def handle(self, method:str, params:dict):
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Buttery Bot", "username": "buttery_bot"}
+        elif method == "getUpdates":
+            result = []
+        elif method == "getFile":
+            file_id = params.get("file_id", "file")
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_path": f"files/{file_id}"}
+        elif method.startswith("send"):
+            chat_id = params.get("chat_id", "0")
+            result = {
+                "message_id": self._next_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+
+        if self.on_request:
+            self.on_request(method, params)
+        return result
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status:int, body:bytes, content_type:str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[0] == "file":
+                    return self._reply(200, FAKE_FILE_CONTENT, "application/octet-stream")
+                if len(parts) != 2 or not parts[0].startswith("bot"):
+                    return self._reply(404, b"{}", "application/json")
+
+                result = fake.handle(parts[1], dict(parse_qsl(url.query)))
+                self._reply(200, json.dumps({"ok": True, "result": result}).encode(), "application/json")
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
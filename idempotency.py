@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from constants import PROCESSED_UPDATE_CAPACITY, PROCESSED_UPDATE_TTL_MINUTES
+from models import Database
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over integer keys."""
+
+    def __init__(self, capacity:int, error_rate:float = 0.01) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key:int):
+        digest = hashlib.blake2b(key.to_bytes(8, "big", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key:int) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key:int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class UpdateDeduplicator:
+    """
+    Detect Telegram updates that have already been processed.
+
+    Two Bloom filter generations are rotated every half TTL, so a negative answer
+    (the common case) costs no database read. Positives are confirmed against the
+    processed_updates table, which is pruned on every rotation.
+    """
+
+    def __init__(self, db:Database, ttl_minutes:int = PROCESSED_UPDATE_TTL_MINUTES, capacity:int = PROCESSED_UPDATE_CAPACITY) -> None:
+        self.db = db
+        self.ttl_minutes = ttl_minutes
+        self.capacity = capacity
+        self.rotate_seconds = ttl_minutes * 60 / 2
+
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity)
+        self._previous = BloomFilter(capacity)
+        self._rotated_at = time.monotonic()
+
+        self.duplicates = 0
+        self._warm()
+
+    def _warm(self) -> None:
+        """Load recently processed update ids so duplicates are caught across restarts."""
+        update_ids = self.db.get_recent_processed_update_ids(self.ttl_minutes)
+        for update_id in update_ids:
+            self._current.add(update_id)
+        logging.info(f"Loaded {len(update_ids)} processed update ids into the deduplicator.")
+
+    def _maybe_rotate(self) -> None:
+        if time.monotonic() - self._rotated_at < self.rotate_seconds:
+            return
+        self._previous = self._current
+        self._current = BloomFilter(self.capacity)
+        self._rotated_at = time.monotonic()
+        pruned = self.db.prune_processed_updates(self.ttl_minutes)
+        logging.info(f"Rotated processed update filter and pruned {pruned} old records.")
+
+    def is_duplicate(self, update_id:int) -> bool:
+        """Return True if the update was seen before, otherwise record it as processed."""
+        with self._lock:
+            self._maybe_rotate()
+
+            maybe_seen = update_id in self._current or update_id in self._previous
+            if maybe_seen and self.db.check_update_processed(update_id):
+                self.duplicates += 1
+                return True
+
+            self._current.add(update_id)
+
+        # The insert also catches ids that have aged out of both filter generations.
+        if not self.db.mark_update_processed(update_id):
+            self.duplicates += 1
+            return True
+        return False
@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import tomllib
+
+from constants import MENU_DETAILS, MENU_FILE, MENU_FLYER, MENU_ITEMS, MENU_WATCH_INTERVAL_SECONDS, MenuDefinition
+from models import Database
+from typing import Optional
+
+
+def parse_menu_file(path:str) -> MenuDefinition:
+    """Read a menu definition from a TOML file."""
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+
+    items = []
+    for item in data.get("items", []):
+        name, quantity, price = item["name"], int(item["quantity"]), float(item["price"])
+        if quantity < 0 or price < 0:
+            raise ValueError(f"Menu item {name} has a negative quantity or price.")
+        items.append((name, quantity, price))
+
+    names = [name for name, _, _ in items]
+    if len(set(names)) != len(names):
+        raise ValueError("Menu item names must be unique.")
+
+    return MenuDefinition(items=items, details=data.get("details") or None, flyer=data.get("flyer") or None)
+
+
+class MenuFile:
+    """Menu definition backed by a file, re-read whenever the file changes on disk."""
+
+    def __init__(self, path:str = MENU_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._definition = MenuDefinition(items=MENU_ITEMS, details=MENU_DETAILS, flyer=MENU_FLYER)
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> MenuDefinition:
+        """Return the current definition, falling back to constants if there is no menu file."""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return self._definition
+
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    self._definition = parse_menu_file(self.path)
+                    logging.info(f"Loaded {len(self._definition.items)} menu items from {self.path}.")
+                except (OSError, ValueError, KeyError, tomllib.TOMLDecodeError) as e:
+                    logging.error(f"Ignoring invalid menu file {self.path}: {e}")
+                self._mtime = mtime
+        return self._definition
+
+
+class MenuWatcher:
+    """Background thread that applies edits of the menu file to the database without a restart."""
+
+    def __init__(
+        self,
+        db:Database,
+        menu_file:MenuFile,
+        interval:float = MENU_WATCH_INTERVAL_SECONDS,
+    ) -> None:
+        self.db = db
+        self.menu_file = menu_file
+        self.interval = interval
+        self._applied = menu_file.load()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="MenuWatcher", daemon=True)
+        self._thread.start()
+        logging.info(f"Watching {self.menu_file.path} for menu changes every {self.interval}s.")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Failed to apply menu file changes: {e}")
+
+    def check(self) -> bool:
+        """Apply the menu file to the database if it changed, returning whether anything was applied."""
+        definition = self.menu_file.load()
+        if definition is self._applied:
+            return False
+        self._applied = definition
+        return self.db.sync_menu_items(definition.items)
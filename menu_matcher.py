@@ -0,0 +1,118 @@
+import bisect
+import difflib
+import re
+import threading
+
+from constants import FUZZY_MATCH_CUTOFF, MenuItem, MenuMatch, ParsedOrder
+from models import Database
+
+ORDER_LINE_PATTERN = re.compile(r"^\s*(\d+)\s*x?\s+(.+?)\s*$", re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenise(text:str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class MenuMatcher:
+    """
+    Resolve loosely typed item names ("alfredo fresh", "shrimp") to menu items.
+
+    The index maps every word of every menu name to the items containing it and is
+    rebuilt only when the menu version changes, so a lookup is a few dictionary and
+    bisect operations plus a difflib fallback for typos.
+    """
+
+    def __init__(self, db:Database) -> None:
+        self.db = db
+        self._lock = threading.Lock()
+        self._version = None
+        self._items: dict[int, MenuItem] = {}
+        self._words: list[str] = []
+        self._items_by_word: dict[str, set[int]] = {}
+        self._main_words: dict[int, set[str]] = {}
+
+    def _ensure_index(self) -> None:
+        version = self.db.menu_version
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            items, items_by_word, main_words = {}, {}, {}
+            for item in self.db.get_menu():
+                items[item.id] = item
+                # Words in brackets, like "(only for Alfredo)", help matching but do not describe the item itself
+                main_words[item.id] = set(tokenise(re.sub(r"\(.*?\)", "", item.name)))
+                for word in tokenise(item.name):
+                    items_by_word.setdefault(word, set()).add(item.id)
+            self._items, self._items_by_word, self._main_words = items, items_by_word, main_words
+            self._words = sorted(items_by_word)
+            self._version = version
+
+    def _items_for_token(self, token:str) -> tuple[set[int], set[str]]:
+        """Find the items and menu words a query word refers to, by prefix or else by spelling."""
+        start = bisect.bisect_left(self._words, token)
+        words = set()
+        for word in self._words[start:]:
+            if not word.startswith(token):
+                break
+            words.add(word)
+        if not words:
+            words = set(difflib.get_close_matches(token, self._words, n=3, cutoff=FUZZY_MATCH_CUTOFF))
+
+        item_ids = set()
+        for word in words:
+            item_ids |= self._items_by_word[word]
+        return item_ids, words
+
+    def match(self, query:str) -> MenuMatch:
+        """Match a query against the menu, returning the item or the equally good candidates."""
+        self._ensure_index()
+        tokens = tokenise(query)
+        if not tokens:
+            return MenuMatch(item=None, candidates=[])
+
+        candidates = None
+        matched_words = set()
+        for token in tokens:
+            item_ids, words = self._items_for_token(token)
+            candidates = item_ids if candidates is None else candidates & item_ids
+            matched_words |= words
+        if not candidates:
+            return MenuMatch(item=None, candidates=[])
+
+        # Prefer the item whose own name is covered best by the query
+        def coverage(item_id:int) -> float:
+            main_words = self._main_words[item_id]
+            return len(main_words & matched_words) / len(main_words) if main_words else 0
+
+        best = max(coverage(item_id) for item_id in candidates)
+        best_ids = sorted(item_id for item_id in candidates if coverage(item_id) == best)
+        if len(best_ids) == 1:
+            return MenuMatch(item=self._items[best_ids[0]], candidates=[])
+        return MenuMatch(item=None, candidates=[self._items[item_id] for item_id in best_ids])
+
+    def parse_order(self, text:str) -> ParsedOrder:
+        """Parse "2 alfredo fresh, 1 shrimp" into (item, quantity) lines, merging repeated items."""
+        quantities: dict[int, int] = {}
+        items: dict[int, MenuItem] = {}
+        unknown, ambiguous = [], []
+
+        for part in text.split(","):
+            if not part.strip():
+                continue
+            line = ORDER_LINE_PATTERN.match(part)
+            quantity, query = (int(line.group(1)), line.group(2)) if line else (1, part.strip())
+
+            result = self.match(query)
+            if result.item:
+                items[result.item.id] = result.item
+                quantities[result.item.id] = quantities.get(result.item.id, 0) + quantity
+            elif result.candidates:
+                ambiguous.append((query, result.candidates))
+            else:
+                unknown.append(query)
+
+        lines = [(items[item_id], quantity) for item_id, quantity in quantities.items()]
+        return ParsedOrder(lines=lines, unknown=unknown, ambiguous=ambiguous)
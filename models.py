@@ -1,9 +1,13 @@
 import logging
 import sqlite3
+import threading
 
-from constants import DB_FILE, MENU_ITEMS, Order, OrderDetail, OrderItem, OrderStatus, MenuItem
-from typing import Optional
-from utils import cast_to_menu_item, cast_to_order, cast_to_order_item, cast_to_order_detail
+from constants import DB_BUSY_TIMEOUT_SECONDS, DB_FILE, EXPORT_BATCH_SIZE, MENU_ITEMS, SCHEMA_VERSION, STATS_WINDOW_MINUTES, CartLine, ExpiredOrders, Order, OrderDetail, OrderExportRow, OrderItem, OrderStatus, MenuItem, PlacedOrder, StatusChange, StatusDuration, StatusWindow, StockChange
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from utils import PhaseTimer, cast_to_menu_item, cast_to_order, cast_to_order_item, cast_to_order_detail, cast_to_order_export_row, cast_to_status_duration, cast_to_status_window, menu_items_version
 
 logger = logging.getLogger(__name__)
 
@@ -15,34 +19,161 @@ def add_log(msg: str):
         return wrapper
     return decorator
 
+def synchronised(func):
+    """Serialise access to the shared connection and cursor across threads."""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return func(self, *args, **kwargs)
+    return wrapper
+
+def notifies_listeners(func):
+    """Pass the status and stock changes committed by a write to the listeners, once the lock is released."""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        result = func(self, *args, **kwargs)
+        self._flush_changes()
+        return result
+    return wrapper
+
 
 class Database:
-    def __init__(self, db_file:str = DB_FILE, test_mode:bool = False) -> None:
+    def __init__(
+        self,
+        db_file:str = DB_FILE,
+        test_mode:bool = False,
+        setup:bool = True,
+        shared:bool = False,
+        read_only:bool = False,
+        menu_items:list[tuple[str, int, float]] = MENU_ITEMS
+    ) -> None:
         self.db_file = db_file
         self.test_mode = test_mode
-
-        self.conn = sqlite3.connect(db_file, check_same_thread=False if sqlite3.threadsafety == 3 else True)
+        self.shared = shared # other processes write to the same database file
+        self.lock = threading.RLock()
+        self.startup_timer = PhaseTimer()
+
+        # Counters bumped whenever menu names/prices, stock levels or order statuses change, used to
+        # invalidate caches. They live in the meta table so commits from other processes move them too.
+        self._revisions: dict[str, int] = {}
+
+        # Called with every committed StatusChange and StockChange, see add_status_listener and add_stock_listener
+        self._status_listeners = []
+        self._stock_listeners = []
+        self._pending_status_changes = []
+        self._pending_stock_changes = []
+
+        if read_only:
+            # For reports on archived databases, which must not be modified
+            self.conn = self._open_reader()
+            self.cursor = self.conn.cursor()
+            logging.info(f"Connected to database: {db_file} (read-only)")
+            return
+
+        self.conn = sqlite3.connect(
+            db_file,
+            timeout=DB_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False if sqlite3.threadsafety == 3 else True
+        )
         self.cursor = self.conn.cursor()
         logging.info(f"Connected to database: {db_file}")
         self._enable_wal_mode()
+        self.startup_timer.mark("connect")
 
+        if not setup:
+            return
         if test_mode:
             self._reset_database()
             self.initialise()
+            self.startup_timer.mark("schema")
             self._populate_test_data()
         else:
             self.initialise()
-            self.init_menu_items() # TODO: do this once incase of restart
-        
+            self.startup_timer.mark("schema")
+            self.sync_menu_items(menu_items)
+        self.startup_timer.mark("seed")
 
     def _enable_wal_mode(self) -> None:
         try:
             self.cursor.execute("PRAGMA journal_mode=WAL;")
+            self.cursor.execute("PRAGMA synchronous=NORMAL;")
             self.conn.commit()
             logging.info(f"Enabled WAL mode on database: {self.db_file}")
         except sqlite3.Error as e:
             logging.error(f"Error enabling WAL mode: {e}")
 
+    @property
+    def menu_version(self) -> int:
+        return self._get_revision("menu_revision")
+
+    @property
+    def stock_version(self) -> int:
+        return self._get_revision("stock_revision")
+
+    @property
+    def external_version(self) -> int:
+        """Changes whenever any process commits a status change or payment to a shared database, always 0 otherwise."""
+        return self._get_revision("status_revision") if self.shared else 0
+
+    def _get_revision(self, key:str) -> int:
+        """Read a change counter, from meta if other processes may have moved it, from memory otherwise."""
+        if not self.shared:
+            return self._revisions.get(key, 0)
+        value = self.get_meta(key)
+        return int(value) if value else 0
+
+    def _bump_revision(self, key:str) -> None:
+        """Advance a change counter inside the caller's write transaction, so other processes see it on commit."""
+        self.cursor.execute(
+            "INSERT INTO meta (key, value) VALUES (?, 1) ON CONFLICT (key) DO UPDATE SET value = value + 1",
+            (key,)
+        )
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in a single write transaction."""
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.cursor
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self._pending_status_changes.clear()
+            self._pending_stock_changes.clear()
+            raise
+
+    def add_status_listener(self, listener:Callable[[StatusChange], None]) -> None:
+        """Call listener with every order status change this connection commits."""
+        self._status_listeners.append(listener)
+
+    def add_stock_listener(self, listener:Callable[[StockChange], None]) -> None:
+        """Call listener whenever this connection commits a change to menu stock."""
+        self._stock_listeners.append(listener)
+
+    def _stock_changed(self, menu_ids:Optional[list[int]] = None) -> None:
+        """Bump the stock version inside the caller's transaction and queue a StockChange, None meaning the whole menu."""
+        self._bump_revision("stock_revision")
+        self._pending_stock_changes.append(StockChange(menu_ids))
+
+    def _flush_changes(self) -> None:
+        with self.lock:
+            status_changes, self._pending_status_changes = self._pending_status_changes, []
+            stock_changes, self._pending_stock_changes = self._pending_stock_changes, []
+        for change in status_changes:
+            for listener in self._status_listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    logging.error(f"Status listener failed for order {change.order_id}: {e}")
+        for change in stock_changes:
+            for listener in self._stock_listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    logging.error(f"Stock listener failed for menu items {change.menu_ids}: {e}")
+
     def __del__(self) -> None:
         """Close the database connection when the object is deleted."""
         if self.conn:
@@ -58,6 +189,10 @@ class Database:
 
     def initialise(self) -> None:
         """Create necessary tables if they don't already exist."""
+        self.cursor.execute("PRAGMA user_version")
+        if self.cursor.fetchone()[0] == SCHEMA_VERSION:
+            logging.info(f"Database schema is up to date (version {SCHEMA_VERSION}).")
+            return
 
         CREATE_MENU_TABLE = """
             CREATE TABLE IF NOT EXISTS menu (
@@ -87,6 +222,57 @@ class Database:
             );
             """
 
+        CREATE_META_TABLE = """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        CREATE_PROCESSED_UPDATES_TABLE = """
+            CREATE TABLE IF NOT EXISTS processed_updates (
+                update_id INTEGER PRIMARY KEY,
+                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        CREATE_PROCESSED_UPDATES_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_processed_updates_processed_at
+            ON processed_updates (processed_at);
+        """
+
+        CREATE_ORDERS_STATUS_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_orders_status_created_at
+            ON orders (status, created_at);
+        """
+
+        # Customers look up their latest order by chat id (/status) and by username (/order)
+        CREATE_ORDERS_CUSTOMER_CHAT_ID_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_orders_customer_chat_id
+            ON orders (customer_chat_id);
+        """
+        CREATE_ORDERS_CUSTOMER_NAME_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_orders_customer_name
+            ON orders (customer_name);
+        """
+
+        CREATE_ORDER_EVENTS_TABLE = """
+            CREATE TABLE IF NOT EXISTS order_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                FOREIGN KEY (order_id) REFERENCES orders (id) ON DELETE CASCADE
+            );
+            """
+        # Time in status walks each order's events in order, throughput scans events by time
+        CREATE_ORDER_EVENTS_ORDER_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_order_events_order_id
+            ON order_events (order_id, id);
+        """
+        CREATE_ORDER_EVENTS_CREATED_AT_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_order_events_created_at
+            ON order_events (created_at, status);
+        """
+
         CREATE_ORDER_DETAILS_VIEW = """
             CREATE VIEW IF NOT EXISTS order_details AS
             SELECT 
@@ -107,114 +293,181 @@ class Database:
         self.cursor.execute(CREATE_MENU_TABLE)
         self.cursor.execute(CREATE_ORDERS_TABLE)
         self.cursor.execute(CREATE_ORDER_ITEMS_TABLE)
+        self.cursor.execute(CREATE_META_TABLE)
+        self.cursor.execute(CREATE_PROCESSED_UPDATES_TABLE)
+        self.cursor.execute(CREATE_PROCESSED_UPDATES_INDEX)
         self.cursor.execute(CREATE_ORDER_DETAILS_VIEW)
+        self.cursor.execute(CREATE_ORDERS_STATUS_INDEX)
+        self.cursor.execute(CREATE_ORDERS_CUSTOMER_CHAT_ID_INDEX)
+        self.cursor.execute(CREATE_ORDERS_CUSTOMER_NAME_INDEX)
+        self.cursor.execute(CREATE_ORDER_EVENTS_TABLE)
+        self.cursor.execute(CREATE_ORDER_EVENTS_ORDER_INDEX)
+        self.cursor.execute(CREATE_ORDER_EVENTS_CREATED_AT_INDEX)
+        self._add_column_if_missing("menu", "active", "INTEGER NOT NULL DEFAULT 1")
+        self._add_column_if_missing("orders", "paid_at", "TIMESTAMP")
+        self._add_column_if_missing("order_events", "expired", "INTEGER NOT NULL DEFAULT 0")
+        # Unit price charged, so later menu price changes do not rewrite past orders
+        self._add_column_if_missing("order_items", "price", "DECIMAL")
+        # Menus seeded more than once before items were matched by name still have duplicates showing
+        self._hide_duplicate_menu_items()
+        self.cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         self.conn.commit()
         logging.info("Initialised database and created tables and views.")
 
-    def init_menu_items(self) -> None:
-        """Add menu items to the database."""
-        for name, quantity, price in MENU_ITEMS:
-            self.insert_menu_item(name, quantity, price)
-        logging.info("Menu items added to database.")
+    def _add_column_if_missing(self, table:str, column:str, definition:str) -> None:
+        """Add a column to an existing table created by an older version of the schema."""
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in self.cursor.fetchall()}:
+            self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logging.info(f"Added column {column} to table {table}.")
+
+    def _hide_duplicate_menu_items(self) -> int:
+        """Hide every menu row except the oldest of each name, which is the one kept in sync."""
+        self.cursor.execute("UPDATE menu SET active = 0 WHERE active = 1 AND id NOT IN (SELECT MIN(id) FROM menu GROUP BY name)")
+        if self.cursor.rowcount:
+            logging.info(f"Hid {self.cursor.rowcount} duplicate menu items.")
+        return self.cursor.rowcount
+
+    @notifies_listeners
+    @synchronised
+    def sync_menu_items(self, items:list[tuple[str, int, float]]) -> bool:
+        """
+        Bring the menu in line with a menu definition in one transaction, matching items by name.
+
+        Existing items keep their id and current stock and only have their price updated, new
+        items are inserted with their listed quantity, and items no longer listed are hidden.
+        Returns False without touching the database if this exact definition was already applied.
+        """
+        version = menu_items_version(items)
+        if self.get_meta("menu_version") == version:
+            logging.info("Menu items already up to date, skipping.")
+            return False
+
+        with self._transaction():
+            self.cursor.execute("SELECT name, MIN(id) FROM menu GROUP BY name")
+            existing = {row[0]: int(row[1]) for row in self.cursor.fetchall()}
+            listed = {name for name, _, _ in items}
+            new_items = [(name, quantity, price) for name, quantity, price in items if name not in existing]
+
+            self.cursor.executemany(
+                "UPDATE menu SET price = ?, active = 1 WHERE id = ?",
+                [(price, existing[name]) for name, _, price in items if name in existing]
+            )
+            self.cursor.executemany("INSERT INTO menu (name, quantity, price) VALUES (?, ?, ?)", new_items)
+            self.cursor.executemany(
+                "UPDATE menu SET active = 0 WHERE name = ?",
+                [(name,) for name in existing if name not in listed]
+            )
+            self._hide_duplicate_menu_items()
+            self.cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('menu_version', ?)", (version,))
+            self._bump_revision("menu_revision")
+            self._stock_changed()
+
+        removed = len(existing.keys() - listed)
+        logging.info(f"Synced {len(items)} menu items: {len(new_items)} new, {removed} hidden.")
+        return True
 
     # Create
+    @notifies_listeners
+    @synchronised
     def insert_menu_item(self, name:str, quantity:int, price:float) -> None:
         """Insert a new item into the menu."""
         query = "INSERT INTO menu (name, quantity, price) VALUES (?, ?, ?)"
-        self.cursor.execute(query, (name, quantity, price))
-
-    def insert_single_order(self, username:str, chat_id:str, item_id:int, quantity:int) -> bool:
-        """Insert a new single order."""
-        # TODO: need try-catch here?
-
-        self.cursor.execute("SELECT quantity FROM menu WHERE id = ?", (item_id,))
-        row = self.cursor.fetchone()
-        available_quantity = int(row[0]) if row else None
-
-        if quantity > available_quantity:
-            logging.warning(f"Not enough stock for item {item_id}. Requested: {quantity}, Available: {available_quantity}")
-            return False
-
-        self.cursor.execute("SELECT id FROM orders WHERE customer_name = ? AND status = ?", (username, OrderStatus.Pending.name,))
-        existing_order = self.cursor.fetchone()
-
-        if not existing_order:
-            self.cursor.execute("INSERT INTO orders (customer_name, customer_chat_id, status) VALUES (?, ?, ?)", (username, chat_id, OrderStatus.Pending.name))
+        with self._transaction():
+            self.cursor.execute(query, (name, quantity, price))
+            self._bump_revision("menu_revision")
+            self._stock_changed()
+
+    @notifies_listeners
+    @synchronised
+    def place_order(self, username:str, chat_id:str, items:list[tuple[int, int]]) -> PlacedOrder:
+        """Validate and reserve stock for every (menu_id, quantity) line and create the order in one transaction."""
+        if not items:
+            raise ValueError("An order needs at least one item.")
+        if any(quantity <= 0 for _, quantity in items):
+            raise ValueError("Order quantities must be positive.")
+
+        # Lines for the same item are merged, order_items holds one row per item
+        merged: dict[int, int] = {}
+        for menu_id, quantity in items:
+            merged[menu_id] = merged.get(menu_id, 0) + quantity
+        items = list(merged.items())
+        menu_ids = list(merged)
+        placeholders = ", ".join("?" for _ in menu_ids)
+
+        with self._transaction():
+            self.cursor.execute(f"SELECT * FROM menu WHERE id IN ({placeholders}) AND active = 1", menu_ids)
+            menu = {item.id: item for item in map(cast_to_menu_item, self.cursor.fetchall())}
+
+            unavailable = [menu_id for menu_id, quantity in items if menu_id not in menu or menu[menu_id].quantity < quantity]
+            if unavailable:
+                logging.warning(f"Not enough stock to place order for {username}. Unavailable items: {unavailable}")
+                return PlacedOrder(order_id=None, lines=[], unavailable=unavailable)
+
+            self.cursor.execute("INSERT INTO orders (customer_name, customer_chat_id, status) VALUES (?, ?, ?)",
+                                (username, chat_id, OrderStatus.AwaitingPayment.name))
             order_id = self.cursor.lastrowid
-            self.cursor.execute("INSERT INTO order_items (order_id, menu_id, quantity) VALUES (?, ?, ?)",
-                                (order_id, item_id, quantity))
-        else:
-            order_id = existing_order[0]
-            self.cursor.execute("SELECT * from order_items WHERE order_id = ? AND menu_id = ?", (order_id, item_id))
-            existing_order_item = self.cursor.fetchone()
-
-            if not existing_order_item:
-                self.cursor.execute("INSERT INTO order_items (order_id, menu_id, quantity) VALUES (?, ?, ?)",
-                                    (order_id, item_id, quantity))
-            else:
-                existing_quantity = existing_order_item[2]
-                updated_quantity = existing_quantity + quantity
-                self.cursor.execute("UPDATE order_items SET quantity = ? WHERE order_id = ? and menu_id = ?",
-                                    (updated_quantity, order_id, item_id))
-
-        new_quantity = available_quantity - quantity
-        self.cursor.execute("UPDATE menu SET quantity = ? WHERE id = ?", (new_quantity, item_id))
-
-        self.conn.commit()
-        logging.info(f"Order for {username} of {quantity}x Item {item_id} added successfully.")
-        return True
-
+            self._record_status_changes([StatusChange(order_id, chat_id, OrderStatus.AwaitingPayment)])
+            self.cursor.executemany("INSERT INTO order_items (order_id, menu_id, quantity, price) VALUES (?, ?, ?, ?)",
+                                    [(order_id, menu_id, quantity, menu[menu_id].price) for menu_id, quantity in items])
+            self.cursor.executemany("UPDATE menu SET quantity = quantity - ? WHERE id = ?",
+                                    [(quantity, menu_id) for menu_id, quantity in items])
+            self._stock_changed(menu_ids)
+
+        lines = [
+            CartLine(menu_id=menu_id, name=menu[menu_id].name, price=menu[menu_id].price, quantity=quantity)
+            for menu_id, quantity in items
+        ]
+        logging.info(f"Order {order_id} for {username} with {len(items)} items placed successfully.")
+        return PlacedOrder(order_id=order_id, lines=lines, unavailable=[])
+
+
+    def _record_status_changes(self, changes:list[StatusChange]) -> None:
+        """Append transitions to the event log inside the caller's transaction and queue them for the listeners."""
+        self.cursor.executemany("INSERT INTO order_events (order_id, status, expired) VALUES (?, ?, ?)",
+                                [(change.order_id, change.status.name, change.expired) for change in changes])
+        self._bump_revision("status_revision")
+        self._pending_status_changes.extend(changes)
 
     # Read
     ## menu
+    @synchronised
     def get_menu(self) -> list[MenuItem]:
-        """Fetch all items from the menu."""
-        self.cursor.execute("SELECT * FROM menu")
+        """Fetch all items currently on the menu."""
+        self.cursor.execute("SELECT * FROM menu WHERE active = 1")
         rows = self.cursor.fetchall()
         return [cast_to_menu_item(row) for row in rows]
     
+    @synchronised
     def get_menu_item_by_id(self, id:int) -> Optional[MenuItem]:
         """Fetch menu item by id."""
         self.cursor.execute("SELECT * FROM menu WHERE id = ?", (id,))
         row = self.cursor.fetchone()
         return cast_to_menu_item(row) if row else None
     
+    @synchronised
     def get_menu_item_by_name(self, name:str) -> Optional[MenuItem]:
         """Fetch menu item by name."""
-        self.cursor.execute("SELECT * FROM menu WHERE name = ?", (name,))
+        self.cursor.execute("SELECT * FROM menu WHERE name = ? AND active = 1", (name,))
         row = self.cursor.fetchone()
         return cast_to_menu_item(row) if row else None
     
-    def get_unselected_menu_item_names_by_username(self, username:str) -> list[MenuItem]:
-        """Fetch menu item names that have not been selected by the user."""
-        query = """
-            SELECT mi.id, mi.name, mi.quantity, mi.price 
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.id
-            JOIN menu mi ON oi.menu_id = mi.id
-            WHERE o.customer_name = ?
-        """
-        self.cursor.execute(query, (username,))
-        rows = self.cursor.fetchall()
-
-        selected_items = {cast_to_menu_item(row) for row in rows}
-        menu_items = self.get_menu()
-        unselected_items = [item for item in menu_items if item not in selected_items]
-        return unselected_items
-    
     ## orders
+    @synchronised
     def get_orders(self) -> list[Order]:
         """Fetch all orders."""
         self.cursor.execute("SELECT * FROM orders")
         rows = self.cursor.fetchall()
         return [cast_to_order(row) for row in rows]
 
+    @synchronised
     def get_order_ids(self) -> list[int]:
         """Fetch all order ids."""
         self.cursor.execute("SELECT id FROM orders")
         rows = self.cursor.fetchall()
         return [int(row[0]) for row in rows]
 
+    @synchronised
     def get_order_ids_by_status(self, status:OrderStatus) -> list[int]:
         """Fetch order ids by status."""
         query = "SELECT * FROM orders WHERE status = ?" 
@@ -222,25 +475,51 @@ class Database:
         rows = self.cursor.fetchall()
         return [int(row[0]) for row in rows]
 
-    def get_pending_orders_for_username(self, username:str) -> list[int]:
-        """Fetch all pending order ids for a username."""
-        query = "SELECT id FROM orders WHERE customer_name = ? AND status = ?"
-        self.cursor.execute(query, (username, OrderStatus.Pending.name))
-        rows = self.cursor.fetchall()
-        return [int(row[0]) for row in rows]
-
+    @synchronised
     def get_status_by_customer_name(self, username:str) -> Optional[OrderStatus]:
-        """Fetch the order status by cusomter_name."""
-        self.cursor.execute("SELECT status FROM orders WHERE customer_name = ?", (username,))
+        """Fetch the status of the latest order by customer_name."""
+        self.cursor.execute("SELECT status FROM orders WHERE customer_name = ? ORDER BY id DESC LIMIT 1", (username,))
         row = self.cursor.fetchone()
         return getattr(OrderStatus, row[0], None) if row else None
 
+    @synchronised
+    def get_latest_order_status_by_chat_id(self, chat_id:str) -> Optional[tuple[int, OrderStatus]]:
+        """Fetch the id and status of the latest order placed from a chat."""
+        self.cursor.execute("SELECT id, status FROM orders WHERE customer_chat_id = ? ORDER BY id DESC LIMIT 1", (chat_id,))
+        row = self.cursor.fetchone()
+        return (int(row[0]), getattr(OrderStatus, row[1], None)) if row else None
+
+    @synchronised
     def get_status_by_id(self, order_id:int) -> Optional[OrderStatus]:
         """Fetch the order status by id."""
         self.cursor.execute("SELECT status FROM orders WHERE id = ?", (order_id,))
         row = self.cursor.fetchone()
         return getattr(OrderStatus, row[0], None) if row else None
     
+    @synchronised
+    def get_queued_order_ids(self, status:OrderStatus) -> list[int]:
+        """
+        Fetch the ids of the orders waiting in a status, first in line first.
+
+        The payment queue only holds orders whose screenshot has arrived, in the order it arrived,
+        other queues are ranked by when each order last entered the status.
+        """
+        if status == OrderStatus.AwaitingPayment:
+            query = "SELECT id FROM orders WHERE status = ? AND paid_at IS NOT NULL ORDER BY paid_at, id"
+        else:
+            query = """
+                SELECT o.id FROM orders o
+                WHERE o.status = ?
+                ORDER BY COALESCE(
+                    (SELECT MAX(e.created_at) FROM order_events e WHERE e.order_id = o.id AND e.status = o.status),
+                    o.created_at
+                ), o.id
+            """
+        self.cursor.execute(query, (status.name,))
+        rows = self.cursor.fetchall()
+        return [int(row[0]) for row in rows]
+
+    @synchronised
     def get_chat_id_by_id(self, order_id:int) -> Optional[str]:
         """Fetch the customer chat id by id."""
         self.cursor.execute("SELECT customer_chat_id FROM orders WHERE id = ?", (order_id,))
@@ -248,6 +527,7 @@ class Database:
         return row[0] if row else None
     
     ## order_items
+    @synchronised
     def get_order_items_for_order_id(self, order_id:int) -> list[OrderItem]:
         """Fetch all order items for a particular order."""
         query = "SELECT * from order_items WHERE order_id = ?"
@@ -256,12 +536,14 @@ class Database:
         return [cast_to_order_item(row) for row in rows]
     
     ## order_details
+    @synchronised
     def get_order_details(self) -> list[OrderDetail]:
         """Fetch full order details from view."""
         self.cursor.execute("SELECT * FROM order_details")
         rows = self.cursor.fetchall()
         return [cast_to_order_detail(row) for row in rows]
         
+    @synchronised
     def get_order_details_by_status(self, status:OrderStatus) -> list[OrderDetail]:
         """Fetch full order details from view by status."""
         query = "SELECT * FROM order_details WHERE status = ?" 
@@ -269,7 +551,136 @@ class Database:
         rows = self.cursor.fetchall()
         return [cast_to_order_detail(row) for row in rows]
 
+    ## export
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open a separate read-only connection, so long reads never hold the shared cursor's lock."""
+        uri = f"{Path(self.db_file).absolute().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=DB_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+
+    def open_snapshot_reader(self) -> "SnapshotReader":
+        return SnapshotReader(self._open_reader())
+
+    def iter_order_export_rows(self, batch_size:int = EXPORT_BATCH_SIZE) -> Iterator[OrderExportRow]:
+        """Stream one row per order line, with its order's total, from a consistent snapshot."""
+        query = """
+            SELECT
+                o.id,
+                o.customer_name,
+                o.customer_chat_id,
+                o.status,
+                o.created_at,
+                m.name,
+                oi.quantity,
+                COALESCE(oi.price, m.price) AS price,
+                oi.quantity * COALESCE(oi.price, m.price) AS line_total,
+                SUM(oi.quantity * COALESCE(oi.price, m.price)) OVER (PARTITION BY o.id) AS order_total
+            FROM orders o
+            JOIN order_items oi ON o.id = oi.order_id
+            JOIN menu m ON oi.menu_id = m.id
+            ORDER BY o.id, m.id
+        """
+        conn = self._open_reader()
+        try:
+            # One read transaction keeps every batch on the same WAL snapshot.
+            conn.execute("BEGIN")
+            cursor = conn.execute(query)
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield cast_to_order_export_row(row)
+        finally:
+            conn.close()
+
+    ## order_events
+    @synchronised
+    def get_status_durations(self) -> list[StatusDuration]:
+        """
+        Compute nearest-rank percentiles of how long orders stayed in each status before moving on.
+
+        Spans ended by the reaper are left out, they measure the expiry timeout rather than the staff.
+        """
+        query = """
+            WITH spans AS (
+                SELECT
+                    status,
+                    (julianday(LEAD(created_at) OVER (PARTITION BY order_id ORDER BY id)) - julianday(created_at)) * 86400 AS seconds,
+                    LEAD(expired) OVER (PARTITION BY order_id ORDER BY id) AS expired
+                FROM order_events
+            ),
+            ranked AS (
+                SELECT
+                    status,
+                    seconds,
+                    ROW_NUMBER() OVER (PARTITION BY status ORDER BY seconds) AS position,
+                    COUNT(*) OVER (PARTITION BY status) AS total
+                FROM spans
+                WHERE seconds IS NOT NULL AND NOT expired
+            )
+            SELECT
+                status,
+                total,
+                MIN(CASE WHEN position * 100 >= total * 50 THEN seconds END),
+                MIN(CASE WHEN position * 100 >= total * 90 THEN seconds END),
+                MIN(CASE WHEN position * 100 >= total * 95 THEN seconds END),
+                MAX(seconds)
+            FROM ranked
+            GROUP BY status, total
+        """
+        self.cursor.execute(query)
+        rows = self.cursor.fetchall()
+        return [cast_to_status_duration(row) for row in rows]
+
+    @synchronised
+    def get_status_windows(self, window_minutes:int = STATS_WINDOW_MINUTES) -> list[StatusWindow]:
+        """Count the orders entering each status per window of window_minutes."""
+        query = """
+            SELECT
+                datetime((CAST(strftime('%s', created_at) AS INTEGER) / ?) * ?, 'unixepoch') AS window_start,
+                status,
+                COUNT(*)
+            FROM order_events
+            GROUP BY window_start, status
+            ORDER BY window_start
+        """
+        window_seconds = window_minutes * 60
+        self.cursor.execute(query, (window_seconds, window_seconds))
+        rows = self.cursor.fetchall()
+        return [cast_to_status_window(row) for row in rows]
+
+    @synchronised
+    def get_recent_departures(self, status:OrderStatus, limit:int) -> list[float]:
+        """Fetch the unix times at which the latest limit orders were moved out of a status, oldest first, leaving out expiries."""
+        query = """
+            SELECT (julianday(created_at) - 2440587.5) * 86400 FROM (
+                SELECT created_at, expired, LAG(status) OVER (PARTITION BY order_id ORDER BY id) AS previous
+                FROM order_events
+            )
+            WHERE previous = ? AND NOT expired
+            ORDER BY created_at DESC
+            LIMIT ?
+        """
+        self.cursor.execute(query, (status.name, limit))
+        rows = self.cursor.fetchall()
+        return [float(row[0]) for row in reversed(rows)]
+
+    ## processed_updates
+    @synchronised
+    def get_recent_processed_update_ids(self, max_age_minutes:int) -> list[int]:
+        """Fetch ids of updates processed within the last max_age_minutes."""
+        query = "SELECT update_id FROM processed_updates WHERE processed_at >= datetime('now', ?)"
+        self.cursor.execute(query, (f"-{max_age_minutes} minutes",))
+        rows = self.cursor.fetchall()
+        return [int(row[0]) for row in rows]
+
+    ## meta
+    @synchronised
+    def get_meta(self, key:str) -> Optional[str]:
+        """Fetch a value from the meta table."""
+        self.cursor.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
     # Check
+    @synchronised
     def check_order_for_id_exists(self, order_id:int) -> bool:
         """Check that order id exists."""
         query = "SELECT COUNT(1) FROM orders WHERE id = ?"
@@ -277,59 +688,157 @@ class Database:
         row = self.cursor.fetchone()
         return row[0] > 0
     
+    @synchronised
     def check_order_for_user_exists(self, username:str) -> bool:
         """Check that order for user exists."""
-        query = "SELECT COUNT(1) FROM orders WHERE customer_name = ? AND status != ?"
-        self.cursor.execute(query, (username,OrderStatus.Pending.name))
+        query = "SELECT COUNT(1) FROM orders WHERE customer_name = ? AND status NOT IN (?, ?)"
+        self.cursor.execute(query, (username, OrderStatus.Pending.name, OrderStatus.Cancelled.name))
         row = self.cursor.fetchone()
         return row[0] > 0
     
+    @synchronised
+    def check_update_processed(self, update_id:int) -> bool:
+        """Check whether an update has already been processed."""
+        self.cursor.execute("SELECT 1 FROM processed_updates WHERE update_id = ?", (update_id,))
+        return self.cursor.fetchone() is not None
+
     # Update
+    @synchronised
+    def mark_update_processed(self, update_id:int) -> bool:
+        """Record an update as processed, returning False if it was already recorded."""
+        self.cursor.execute("INSERT OR IGNORE INTO processed_updates (update_id) VALUES (?)", (update_id,))
+        self.conn.commit()
+        return self.cursor.rowcount == 1
+
+    @synchronised
+    def mark_order_paid(self, order_id:int) -> bool:
+        """Record that a payment screenshot arrived, returning False if the order is no longer awaiting payment."""
+        # A screenshot sent again keeps the order's place in the payment queue
+        query = "UPDATE orders SET paid_at = COALESCE(paid_at, strftime('%Y-%m-%d %H:%M:%f', 'now')) WHERE id = ? AND status = ?"
+        self.cursor.execute(query, (order_id, OrderStatus.AwaitingPayment.name))
+        paid = self.cursor.rowcount == 1
+        if paid:
+            # Joining the payment queue moves other processes' queue positions like a status change
+            self._bump_revision("status_revision")
+        self.conn.commit()
+        return paid
+
+    @notifies_listeners
+    @synchronised
     def reduce_menu_item_quantity(self, item_id:int, quantity:int) -> None:
         """Reduce menu item quantity."""
-        self.cursor.execute("SELECT quantity FROM menu WHERE id = ?", (item_id,))
+        query = "UPDATE menu SET quantity = MAX(quantity - ?, 0) WHERE id = ? RETURNING quantity"
+        self.cursor.execute(query, (quantity, item_id))
         row = self.cursor.fetchone()
-        current_quantity = row[0] if row else None
-        
-        new_quantity = max(current_quantity - quantity, 0)
-        self.cursor.execute("UPDATE menu SET quantity = ? WHERE id = ?", (new_quantity, item_id))
+        new_quantity = row[0] if row else None
+        self._stock_changed([item_id])
         self.conn.commit()
         logging.info(f"Menu item {item_id} quantity reduced to {new_quantity}.")
 
+    @notifies_listeners
+    @synchronised
     def update_order_status(self, order_id:int, status:OrderStatus) -> None:
-        """Update order status."""
-        query = "UPDATE orders SET status = ? WHERE id = ?"
-        self.cursor.execute(query, (status.name, order_id))
-        self.conn.commit()
+        """Update order status and record the transition."""
+        with self._transaction():
+            self.cursor.execute("SELECT customer_chat_id, status FROM orders WHERE id = ?", (order_id,))
+            row = self.cursor.fetchone()
+            if row and row[1] != status.name:
+                # paid_at is kept if an admin sends the order back to AwaitingPayment, the customer already paid
+                self.cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (status.name, order_id))
+                previous = getattr(OrderStatus, row[1], None)
+                self._record_status_changes([StatusChange(order_id, row[0], status, previous)])
         logging.info(f"Order {order_id} status updated to {status.name}.")
 
+    @notifies_listeners
+    @synchronised
+    def expire_stale_orders(self, status:OrderStatus, max_age_minutes:int) -> ExpiredOrders:
+        """
+        Cancel orders that entered a status more than max_age_minutes ago and return their stock to the menu.
+
+        Orders whose customer already sent a payment screenshot are waiting on an admin, not abandoned,
+        and are left alone.
+        """
+        query = """
+            SELECT o.id, o.customer_chat_id
+            FROM orders o
+            WHERE o.status = ?
+            AND o.paid_at IS NULL
+            AND COALESCE(
+                (SELECT MAX(e.created_at) FROM order_events e WHERE e.order_id = o.id AND e.status = o.status),
+                o.created_at
+            ) < strftime('%Y-%m-%d %H:%M:%f', 'now', ?)
+        """
+        with self._transaction():
+            self.cursor.execute(query, (status.name, f"-{max_age_minutes} minutes"))
+            orders = [(int(row[0]), row[1]) for row in self.cursor.fetchall()]
+            if not orders:
+                return ExpiredOrders(orders=[], reclaimed_stock={})
+
+            order_ids = [order_id for order_id, _ in orders]
+            placeholders = ", ".join("?" for _ in order_ids)
+            self.cursor.execute(
+                f"SELECT menu_id, SUM(quantity) FROM order_items WHERE order_id IN ({placeholders}) GROUP BY menu_id",
+                order_ids
+            )
+            reclaimed_stock = {int(row[0]): int(row[1]) for row in self.cursor.fetchall()}
+
+            self.cursor.executemany(
+                "UPDATE menu SET quantity = quantity + ? WHERE id = ?",
+                [(quantity, menu_id) for menu_id, quantity in reclaimed_stock.items()]
+            )
+            self.cursor.executemany(
+                "UPDATE orders SET status = ? WHERE id = ?",
+                [(OrderStatus.Cancelled.name, order_id) for order_id in order_ids]
+            )
+            self._record_status_changes([
+                StatusChange(order_id, chat_id, OrderStatus.Cancelled, status, expired=True) for order_id, chat_id in orders
+            ])
+            if reclaimed_stock:
+                self._stock_changed(list(reclaimed_stock))
+
+        logging.info(f"Expired {len(orders)} orders left {status.name} for more than {max_age_minutes} minutes.")
+        return ExpiredOrders(orders=orders, reclaimed_stock=reclaimed_stock)
+
+    # Delete
+    @synchronised
+    def prune_processed_updates(self, max_age_minutes:int) -> int:
+        """Delete processed update records older than max_age_minutes."""
+        query = "DELETE FROM processed_updates WHERE processed_at < datetime('now', ?)"
+        self.cursor.execute(query, (f"-{max_age_minutes} minutes",))
+        self.conn.commit()
+        return self.cursor.rowcount
+
     # Testing 
     def _insert_bulk_order(self, customer_name:str, ordered_items: list[tuple[int, int]]) -> None:
         """Insert a new bulk order."""
         self.cursor.execute("INSERT INTO orders (customer_name, customer_chat_id, status) VALUES (?, ?, ?)",
                             (customer_name, "", OrderStatus.AwaitingPayment.name))
         order_id = self.cursor.lastrowid
+        self._record_status_changes([StatusChange(order_id, "", OrderStatus.AwaitingPayment)])
 
-        for item_id, quantity in ordered_items:
-            self.cursor.execute("INSERT INTO order_items (order_id, menu_id, quantity) VALUES (?, ?, ?)",
-                                (order_id, item_id, quantity))
-        
-        self.conn.commit()
+        self.cursor.executemany("INSERT INTO order_items (order_id, menu_id, quantity, price) SELECT ?, id, ?, price FROM menu WHERE id = ?",
+                                [(order_id, quantity, item_id) for item_id, quantity in ordered_items])
         logging.info(f"Order for {customer_name} with {len(ordered_items)} items added successfully.")
 
 
+    @notifies_listeners
     def _populate_test_data(self) -> None:
         """Populate the database with some test data for testing purposes."""
-        # Insert some items into the menu
-        self.insert_menu_item("Chili Oil Dumplings", 20, 3)
-        self.insert_menu_item("Scallion Oil Noodles", 15, 2)
-        self.insert_menu_item("Egg (for noodles)", 15, 0.5)
-        self.insert_menu_item("Mandarin Fresh Cream Roll", 10, 2.5)
-
-        # Insert some orders
-        self._insert_bulk_order("Alice", [(1, 1), (4, 1)])
-        self._insert_bulk_order("Bob", [(2, 1), (3, 1)])
-        self._insert_bulk_order("Charl_ie", [(1, 2), (2, 1), (4, 1)])
+        with self._transaction():
+            # Insert some items into the menu
+            self.cursor.executemany("INSERT INTO menu (name, quantity, price) VALUES (?, ?, ?)", [
+                ("Chili Oil Dumplings", 20, 3),
+                ("Scallion Oil Noodles", 15, 2),
+                ("Egg (for noodles)", 15, 0.5),
+                ("Mandarin Fresh Cream Roll", 10, 2.5),
+            ])
+
+            # Insert some orders
+            self._insert_bulk_order("Alice", [(1, 1), (4, 1)])
+            self._insert_bulk_order("Bob", [(2, 1), (3, 1)])
+            self._insert_bulk_order("Charl_ie", [(1, 2), (2, 1), (4, 1)])
+            self._bump_revision("menu_revision")
+            self._stock_changed()
 
         logging.info("Test data populated.")
 
@@ -339,6 +848,56 @@ class Database:
         self.cursor.execute("DROP TABLE IF EXISTS menu;")
         self.cursor.execute("DROP TABLE IF EXISTS orders;")
         self.cursor.execute("DROP TABLE IF EXISTS order_items;")
+        self.cursor.execute("DROP TABLE IF EXISTS order_events;")
+        self.cursor.execute("DROP TABLE IF EXISTS processed_updates;")
+        self.cursor.execute("DROP TABLE IF EXISTS meta;")
+        self.cursor.execute("PRAGMA user_version = 0")
 
         self.conn.commit()
         logging.info("Database reset: All tables have been dropped and reset.")
+
+
+class SnapshotReader:
+    """Read-only connection for long lived readers such as the dashboard, kept apart from the shared cursor."""
+
+    def __init__(self, conn:sqlite3.Connection) -> None:
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def revisions(self) -> tuple:
+        """Menu, stock and status change counters, which move whenever any process commits such a change."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('menu_revision', 'stock_revision', 'status_revision') ORDER BY key"
+            ).fetchall()
+        return tuple(rows)
+
+    def get_board(self) -> tuple[list[OrderDetail], list[MenuItem]]:
+        """Fetch every order and the menu stock from the same snapshot."""
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                orders = self.conn.execute("SELECT * FROM order_details ORDER BY order_id").fetchall()
+                menu = self.conn.execute("SELECT * FROM menu WHERE active = 1").fetchall()
+            finally:
+                self.conn.rollback()
+        return [cast_to_order_detail(row) for row in orders], [cast_to_menu_item(row) for row in menu]
+
+    def get_order_detail(self, order_id:int) -> Optional[OrderDetail]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM order_details WHERE order_id = ?", (order_id,)).fetchone()
+        return cast_to_order_detail(row) if row else None
+
+    def get_menu_items(self, menu_ids:Optional[list[int]] = None) -> list[MenuItem]:
+        """Fetch the listed menu items, or the whole active menu if menu_ids is None."""
+        with self.lock:
+            if menu_ids is None:
+                rows = self.conn.execute("SELECT * FROM menu WHERE active = 1").fetchall()
+            else:
+                placeholders = ", ".join("?" for _ in menu_ids)
+                rows = self.conn.execute(f"SELECT * FROM menu WHERE id IN ({placeholders})", menu_ids).fetchall()
+        return [cast_to_menu_item(row) for row in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,157 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+
+from constants import PROFILE_TOP_N, TRACEMALLOC_FRAMES
+from typing import Callable, Optional
+
+
+class HandlerProfiler:
+    """
+    Profile handler tasks with cProfile for a number of seconds or handled updates.
+
+    Each task gets its own profile, which is merged into the session's stats, so
+    concurrent lanes never share a profiler. While no session runs, the only cost
+    is the check of `active` before every task.
+    """
+
+    def __init__(self, top_n:int = PROFILE_TOP_N) -> None:
+        self.top_n = top_n
+        self.active = False
+        self._lock = threading.Lock()
+        self._session = 0
+        self._stats = None
+        self._remaining = None
+        self._started_at = 0.0
+        self._tasks = 0
+        self._timer = None
+        self._on_done = None
+
+    def start(self, on_done:Callable[[str], None], seconds:Optional[float] = None, updates:Optional[int] = None) -> bool:
+        """Start a session ending after seconds or updates, returning False if one is already running."""
+        if not (seconds and seconds > 0) and not (updates and updates > 0):
+            raise ValueError("A profile needs a positive number of seconds or updates, or it would never end.")
+        with self._lock:
+            if self.active:
+                return False
+            self._session += 1
+            self._stats = None
+            self._remaining = updates
+            self._started_at = time.perf_counter()
+            self._tasks = 0
+            self._on_done = on_done
+            if seconds:
+                self._timer = threading.Timer(seconds, self._finish, args=(self._session,))
+                self._timer.daemon = True
+                self._timer.start()
+            self.active = True
+        logging.info(f"Started profiling handlers for {f'{seconds}s' if seconds else f'{updates} updates'}.")
+        return True
+
+    def profile(self, task:Callable, *args, **kwargs):
+        """Run a task under cProfile and merge its stats into the current session."""
+        session = self._session
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return task(*args, **kwargs)
+        try:
+            return task(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._merge(session, profile)
+
+    def _merge(self, session:int, profile:cProfile.Profile) -> None:
+        with self._lock:
+            if not self.active or session != self._session:
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._tasks += 1
+            if self._remaining is not None:
+                self._remaining -= 1
+                done = self._remaining <= 0
+            else:
+                done = False
+        if done:
+            self._finish(session)
+
+    def _finish(self, session:int) -> None:
+        with self._lock:
+            if not self.active or session != self._session:
+                return
+            self.active = False
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            stats, on_done = self._stats, self._on_done
+            elapsed = time.perf_counter() - self._started_at
+            tasks = self._tasks
+        logging.info(f"Finished profiling {tasks} handler tasks over {elapsed:.1f}s.")
+        on_done(self.report(stats, tasks, elapsed))
+
+    def report(self, stats:Optional[pstats.Stats], tasks:int, elapsed:float) -> str:
+        if stats is None:
+            return f"No handler tasks ran during the {elapsed:.1f}s profile.\n"
+
+        output = io.StringIO()
+        output.write(f"Profiled {tasks} handler tasks over {elapsed:.1f}s.\n\n")
+        stats.stream = output
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+        return output.getvalue()
+
+
+class MemoryProfiler:
+    """Compare tracemalloc snapshots taken at the start and end of a window to find allocation growth."""
+
+    def __init__(self, top_n:int = PROFILE_TOP_N, frames:int = TRACEMALLOC_FRAMES) -> None:
+        self.top_n = top_n
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def active(self) -> bool:
+        return self._timer is not None
+
+    def start(self, seconds:float, on_done:Callable[[str], None]) -> bool:
+        """Start tracing allocations for seconds, returning False if tracing is already running."""
+        if seconds <= 0:
+            raise ValueError("Memory tracing needs a positive number of seconds.")
+        with self._lock:
+            if self.active or tracemalloc.is_tracing():
+                return False
+            tracemalloc.start(self.frames)
+            baseline = tracemalloc.take_snapshot()
+            self._timer = threading.Timer(seconds, self._finish, args=(baseline, seconds, on_done))
+            self._timer.daemon = True
+            self._timer.start()
+        logging.info(f"Started tracing memory allocations for {seconds}s.")
+        return True
+
+    def _finish(self, baseline:tracemalloc.Snapshot, seconds:float, on_done:Callable[[str], None]) -> None:
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._timer = None
+
+        # Leave out the tracing machinery itself
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        differences = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), "lineno")
+
+        output = io.StringIO()
+        output.write(f"Allocation growth over {seconds}s (traced now {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB)\n\n")
+        for difference in differences[:self.top_n]:
+            output.write(f"{difference}\n")
+        logging.info(f"Finished tracing memory allocations over {seconds}s.")
+        on_done(output.getvalue())
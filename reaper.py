@@ -0,0 +1,92 @@
+import logging
+import threading
+
+from collections import Counter
+from constants import AWAITING_PAYMENT_TIMEOUT_MINUTES, REAPER_INTERVAL_SECONDS, OrderStatus
+from models import Database
+from typing import Callable, Optional
+
+
+class OrderReaper:
+    """Background worker that cancels unpaid orders and returns their stock to the menu."""
+
+    def __init__(
+        self,
+        db:Database,
+        awaiting_payment_timeout:int = AWAITING_PAYMENT_TIMEOUT_MINUTES,
+        interval:float = REAPER_INTERVAL_SECONDS,
+        on_expired:Optional[Callable[[int, str, OrderStatus], None]] = None,
+    ) -> None:
+        self.db = db
+        # Pending orders only live in the in-memory cart store, which expires them itself
+        self.timeouts = {
+            OrderStatus.AwaitingPayment: awaiting_payment_timeout,
+        }
+        self.interval = interval
+        self.on_expired = on_expired
+
+        # Metrics
+        self.sweeps = 0
+        self.orders_expired = Counter()
+        self.stock_reclaimed = Counter()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start sweeping in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="OrderReaper", daemon=True)
+        self._thread.start()
+        logging.info(f"Order reaper started with timeouts {self._format_timeouts()} every {self.interval}s.")
+
+    def stop(self) -> None:
+        """Stop the sweeping thread."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+        logging.info("Order reaper stopped.")
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Order reaper sweep failed: {e}")
+
+    def sweep(self) -> int:
+        """Expire all stale orders once and return the number of orders cancelled."""
+        self.sweeps += 1
+        expired_count = 0
+
+        for status, timeout in self.timeouts.items():
+            expired = self.db.expire_stale_orders(status, timeout)
+            if not expired.orders:
+                continue
+
+            expired_count += len(expired.orders)
+            self.orders_expired[status.name] += len(expired.orders)
+            self.stock_reclaimed.update(expired.reclaimed_stock)
+
+            if self.on_expired:
+                for order_id, chat_id in expired.orders:
+                    try:
+                        self.on_expired(order_id, chat_id, status)
+                    except Exception as e:
+                        logging.error(f"Failed to notify chat {chat_id} of expired order {order_id}: {e}")
+
+        if expired_count:
+            logging.info(
+                f"Reaper sweep {self.sweeps}: expired {expired_count} orders, "
+                f"reclaimed {self.total_stock_reclaimed()} items in total {dict(self.stock_reclaimed)}."
+            )
+        return expired_count
+
+    def total_stock_reclaimed(self) -> int:
+        """Total quantity of menu items returned to stock since start."""
+        return sum(self.stock_reclaimed.values())
+
+    def _format_timeouts(self) -> str:
+        return ", ".join(f"{status.name}={minutes}m" for status, minutes in self.timeouts.items())
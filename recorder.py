@@ -0,0 +1,44 @@
+import json
+import logging
+import threading
+import time
+
+from typing import Iterator
+
+
+class UpdateRecorder:
+    """Append every raw update Telegram delivers to a JSONL file, one {"ts", "update"} object per line."""
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        logging.info(f"Recording updates to {path}.")
+
+    def record(self, updates:list[dict]) -> None:
+        if not updates:
+            return
+        ts = round(time.time(), 3)
+        lines = "".join(json.dumps({"ts": ts, "update": update}, separators=(",", ":")) + "\n" for update in updates)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            self.recorded += len(updates)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        logging.info(f"Recorded {self.recorded} updates to {self.path}.")
+
+
+def read_recording(path:str) -> Iterator[tuple[float, dict]]:
+    """Yield (timestamp, raw update) pairs from a recording, skipping a torn last line."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping unreadable line in {path}.")
+                continue
+            yield entry["ts"], entry["update"]
@@ -0,0 +1,39 @@
+import logging
+import threading
+
+from typing import Any, Callable, Hashable
+
+
+class ResponseCache:
+    """
+    Cache of fully rendered responses (message text and pre-serialised reply markup),
+    and of the menu rows they are rendered from.
+
+    Each entry is stored with the version it was rendered against, so callers pass
+    the current menu/stock version and stale entries are rebuilt on the next lookup.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[Hashable, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key:Hashable, render:Callable[[], Any], version:Hashable = None) -> Any:
+        """Return the cached response for key, rendering it if missing or out of date."""
+        entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        response = render()
+        with self._lock:
+            self._entries[key] = (version, response)
+            self.misses += 1
+        logging.debug(f"Rendered response {key} for version {version}.")
+        return response
+
+    def invalidate(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,161 @@
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from bot import create_bot
+from collections import Counter
+from constants import MENU_FILE
+from dispatch import LaneDispatcher
+from fake_telegram import FakeTelegramServer
+from menu_file import MenuFile
+from models import Database
+from recorder import read_recording
+from telebot import types
+from typing import Optional
+
+REPLAY_TOKEN = "123456:replay"
+
+
+class LatencyTracker:
+    """Time each update from being fed to the bot until its handler has finished."""
+
+    def __init__(self) -> None:
+        self.latencies = []
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._idle = threading.Condition(self._lock)
+
+    def started(self) -> float:
+        with self._lock:
+            self._outstanding += 1
+        return time.perf_counter()
+
+    def finished(self, fed_at:float) -> None:
+        with self._lock:
+            self.latencies.append(time.perf_counter() - fed_at)
+            self._outstanding -= 1
+            self._idle.notify_all()
+
+    def wait_idle(self, timeout:float) -> bool:
+        with self._lock:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+
+def percentile(sorted_values:list[float], p:float) -> float:
+    if not sorted_values:
+        return 0
+    return sorted_values[max(int(len(sorted_values) * p / 100 + 0.5) - 1, 0)]
+
+
+def replay(
+    path:str,
+    speed:Optional[float],
+    admins:list[str],
+    menu_path:str = MENU_FILE,
+    latency:float = 0.0,
+    lanes:int = 4,
+    timeout:float = 300,
+    db_file:Optional[str] = None,
+) -> dict:
+    """Feed a recording into the bot's handlers against a scratch database and a fake Telegram API."""
+    recording = list(read_recording(path))
+    menu_file = MenuFile(menu_path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(db_file or os.path.join(tmp_dir, "replay.db"), menu_items=menu_file.load().items)
+        server = FakeTelegramServer(latency=latency).start()
+        server.install()
+
+        dispatcher = LaneDispatcher(customer_lanes=lanes)
+        bot = create_bot(REPLAY_TOKEN, db, admins, admin_chat_ids=[], dispatcher=dispatcher, menu_file=menu_file)
+        tracker = LatencyTracker()
+
+        start = time.perf_counter()
+        first_ts = recording[0][0] if recording else 0
+        for ts, raw_update in recording:
+            if speed:
+                delay = start + (ts - first_ts) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            update = types.Update.de_json(raw_update)
+            message = update.message or update.edited_message
+            fed_at = tracker.started()
+            bot.process_new_updates([update])
+            if message is None:
+                tracker.finished(fed_at)
+            else:
+                # Lanes run a chat's tasks in order, so this runs right after the update was handled
+                is_admin = message.chat.username in bot.admins
+                dispatcher.dispatch(message.chat.id, is_admin, tracker.finished, fed_at)
+
+        drained = tracker.wait_idle(timeout)
+        elapsed = time.perf_counter() - start
+        dispatcher.close()
+        server.stop()
+
+        orders = db.get_orders()
+        menu = db.get_menu()
+        db.shutdown()
+
+    latencies = sorted(tracker.latencies)
+    return {
+        "updates": len(recording),
+        "drained": drained,
+        "seconds": elapsed,
+        "recorded_seconds": recording[-1][0] - first_ts if recording else 0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0,
+        "api_calls": dict(server.calls),
+        "orders_by_status": Counter(order.status.name for order in orders),
+        "stock": {item.name: item.quantity for item in menu},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recording made with bot.py --record")
+    parser.add_argument("recording", help="JSONL file of recorded updates")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument("-s", "--speed", help="Replay speed relative to the recording, e.g. 1 or 10", type=float, default=1)
+    speed.add_argument("--max", help="Replay as fast as possible", action="store_true")
+    parser.add_argument("-a", "--admins", help="Usernames to treat as admins", nargs="*", default=[])
+    parser.add_argument("-m", "--menu", help="Menu file the recorded night used", default=MENU_FILE)
+    parser.add_argument("-l", "--latency-ms", help="Simulated Telegram API latency per call", type=float, default=0)
+    parser.add_argument("--lanes", help="Customer worker lanes", type=int, default=4)
+    parser.add_argument("--db", help="Keep the resulting database at this path instead of a temporary file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} already exists, replay needs a fresh database.")
+
+    result = replay(
+        args.recording,
+        speed=None if args.max else args.speed,
+        admins=args.admins,
+        menu_path=args.menu,
+        latency=args.latency_ms / 1000,
+        lanes=args.lanes,
+        db_file=args.db,
+    )
+
+    speed_label = "max" if args.max else f"{args.speed:g}x"
+    print(
+        f"Replayed {result['updates']} updates at {speed_label} in {result['seconds']:.2f}s "
+        f"(recorded over {result['recorded_seconds']:.2f}s)" + ("" if result["drained"] else " (timed out)")
+    )
+    print(
+        f"Latency ms: p50 {result['p50_ms']:.1f}  p95 {result['p95_ms']:.1f}  p99 {result['p99_ms']:.1f}  "
+        f"max {result['max_ms']:.1f}  mean {result['mean_ms']:.1f}"
+    )
+    print("API calls: " + ", ".join(f"{method} {count}" for method, count in sorted(result["api_calls"].items())))
+    print("Orders: " + (", ".join(f"{status} {count}" for status, count in sorted(result["orders_by_status"].items())) or "none"))
+    print("Stock left: " + ", ".join(f"{name} {quantity}" for name, quantity in result["stock"].items()))
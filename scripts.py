@@ -3,8 +3,10 @@ import os
 import shutil
 import sqlite3
 
-from constants import ARCHIVE_DIR, AVAIL_CMDS, DB_FILE
+from constants import ARCHIVE_DIR, AVAIL_CMDS, DB_FILE, STATS_WINDOW_MINUTES
 from datetime import datetime
+from models import Database
+from utils import format_order_stats
 
 def convert_commands_for_botfather(include_admin_only:bool) -> str:
     """Convert commands to the format that BotFather accepts for /setcommands"""
@@ -30,13 +32,21 @@ def archive_db() -> None:
     except Exception as e:
         print(f"An error occurred while archiving: {e}")
 
+def charged_price_column(cursor:sqlite3.Cursor) -> str:
+    """Use the price stored with each order line, or the menu price for archives made before it was stored."""
+    cursor.execute("PRAGMA table_info(order_items)")
+    if "price" in {row[1] for row in cursor.fetchall()}:
+        return "COALESCE(oi.price, m.price)"
+    return "m.price"
+
 def visualise_db(path:str) -> None:
     conn = sqlite3.connect(path)
     cursor = conn.cursor()
+    price = charged_price_column(cursor)
 
     # Calculate total sales
-    cursor.execute("""
-        SELECT oi.menu_id, m.name, SUM(oi.quantity * m.price) AS total_sales
+    cursor.execute(f"""
+        SELECT oi.menu_id, m.name, SUM(oi.quantity * {price}) AS total_sales
         FROM order_items oi
         JOIN menu m ON oi.menu_id = m.id
         GROUP BY oi.menu_id
@@ -44,8 +54,8 @@ def visualise_db(path:str) -> None:
     menu_sales = cursor.fetchall()
     print("Sales by Menu Item: ", menu_sales)
 
-    cursor.execute("""
-        SELECT SUM(oi.quantity * m.price) AS total_sales
+    cursor.execute(f"""
+        SELECT SUM(oi.quantity * {price}) AS total_sales
         FROM order_items oi
         JOIN menu m ON oi.menu_id = m.id
     """)
@@ -56,18 +66,36 @@ def visualise_db(path:str) -> None:
     # read from db and make statistics and plots
     return None
 
+def order_stats(path:str, window_minutes:int) -> None:
+    if not os.path.exists(path):
+        print(f"Error: {path} does not exist.")
+        return
+
+    db = Database(path, read_only=True)
+    try:
+        print(format_order_stats(db.get_status_durations(), db.get_status_windows(window_minutes)))
+    except sqlite3.OperationalError as e:
+        print(f"Error: {path} has no order events ({e}).")
+    finally:
+        db.shutdown()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command", help="Subcommands")
 
     archive_parser = subparsers.add_parser("archive", help="Archive the database")
     visualise_parser = subparsers.add_parser("visualize", help="Visualize the database")
+    stats_parser = subparsers.add_parser("stats", help="Show time in each order status and orders per window")
+    stats_parser.add_argument("path", help="Database file to read", nargs="?", default=DB_FILE)
+    stats_parser.add_argument("-m", "--window-minutes", help="Window size in minutes", type=int, default=STATS_WINDOW_MINUTES)
 
     args = parser.parse_args()
     if args.command == "archive":
         archive_db()
     elif args.command == "visualize":
         visualise_db("archive/2025-03-06.db")
+    elif args.command == "stats":
+        order_stats(args.path, args.window_minutes)
     else:
         # print(convert_commands_for_botfather(False))j
         parser.print_help()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import zlib
+
+from constants import ADMIN_LANES, SHARD_QUEUE_LIMIT, WorkerConfig
+from dispatch import LaneDispatcher
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from idempotency import UpdateDeduplicator
+from models import Database
+from recorder import UpdateRecorder
+from telebot import apihelper, types
+from typing import Optional
+
+
+def chat_id_of(update:dict) -> Optional[int]:
+    """Extract the chat id an update belongs to, if any."""
+    message = update.get("message") or update.get("edited_message")
+    if message:
+        return message["chat"]["id"]
+    callback_query = update.get("callback_query")
+    if callback_query:
+        return callback_query["from"]["id"]
+    return None
+
+
+def shard_of(chat_id:Optional[int], worker_count:int) -> int:
+    """Pick the worker for a chat, hashed differently from the in-process lanes so both levels spread."""
+    if chat_id is None:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % worker_count
+
+
+def run_worker(index:int, config:WorkerConfig, updates:multiprocessing.Queue, ready) -> None:
+    """Entry point of a worker process: handle batches of raw updates until told to stop."""
+    from bot import create_bot, setup_logging
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # the ingress coordinates shutdown
+    setup_logging(log_dir=config.log_dir, test_mode=config.test_mode)
+    if config.api_url:
+        apihelper.API_URL = config.api_url
+    if config.file_url:
+        apihelper.FILE_URL = config.file_url
+
+    db = Database(config.db_file, setup=False, shared=True)
+    dispatcher = LaneDispatcher(customer_lanes=config.lanes, admin_lanes=ADMIN_LANES)
+    bot = create_bot(config.token, db, config.admins, config.admin_chat_ids, dispatcher=dispatcher)
+    logging.info(f"Worker {index} ready.")
+    ready.set()
+
+    while (batch := updates.get()) is not None:
+        bot.process_new_updates([types.Update.de_json(update) for update in batch])
+
+    dispatcher.close()
+    db.shutdown()
+    logging.info(f"Worker {index} stopped.")
+
+
+class ShardedIngress:
+    """
+    Receive updates in one process and route them by chat id to worker processes.
+
+    A chat always lands on the same worker, so its conversation state (next step
+    handlers, cart) stays in one place. Workers share the database in WAL mode.
+    """
+
+    def __init__(
+        self,
+        worker_count:int,
+        config:WorkerConfig,
+        deduplicator:Optional[UpdateDeduplicator] = None,
+        recorder:Optional[UpdateRecorder] = None,
+    ) -> None:
+        self.worker_count = worker_count
+        self.config = config
+        self.deduplicator = deduplicator
+        self.recorder = recorder
+        self.last_update_id = 0
+        self.routed = [0] * worker_count
+
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue(maxsize=SHARD_QUEUE_LIMIT) for _ in range(worker_count)]
+        self._ready = [self._context.Event() for _ in range(worker_count)]
+        self._workers = []
+        self._stopping = threading.Event()
+        self._submit_lock = threading.Lock()
+
+    def start(self, timeout:float = 60) -> None:
+        """Start the worker processes and wait until they are ready to handle updates."""
+        for index in range(self.worker_count):
+            worker = self._context.Process(
+                target=run_worker,
+                args=(index, self.config, self._queues[index], self._ready[index]),
+                name=f"Worker-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        for index, ready in enumerate(self._ready):
+            if not ready.wait(timeout):
+                raise RuntimeError(f"Worker {index} did not start within {timeout}s.")
+        logging.info(f"Started {self.worker_count} worker processes.")
+
+    def submit(self, updates:list[dict]) -> None:
+        """Deduplicate raw updates and hand them to the worker that owns their chat."""
+        batches = [[] for _ in range(self.worker_count)]
+        if self.recorder:
+            self.recorder.record(updates)
+        with self._submit_lock:
+            for update in updates:
+                self.last_update_id = max(self.last_update_id, update["update_id"])
+                if self.deduplicator and self.deduplicator.is_duplicate(update["update_id"]):
+                    logging.warning(f"Skipping already processed update {update['update_id']}.")
+                    continue
+                batches[shard_of(chat_id_of(update), self.worker_count)].append(update)
+
+            for index, batch in enumerate(batches):
+                if batch:
+                    self._queues[index].put(batch)
+                    self.routed[index] += len(batch)
+
+    def poll_forever(self, timeout:int = 20, retry_interval:float = 3) -> None:
+        """Long poll Telegram for updates until stopped."""
+        logging.info("Ingress started polling.")
+        while not self._stopping.is_set():
+            try:
+                updates = apihelper.get_updates(
+                    self.config.token,
+                    offset=self.last_update_id + 1,
+                    timeout=timeout,
+                    long_polling_timeout=timeout,
+                )
+            except Exception as e:
+                logging.error(f"Ingress polling failed: {e}")
+                self._stopping.wait(retry_interval)
+                continue
+            self.submit(updates)
+
+    def serve_webhook(self, host:str, port:int) -> ThreadingHTTPServer:
+        """Accept updates POSTed by a Telegram webhook (usually behind a TLS reverse proxy)."""
+        ingress = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    ingress.submit([json.loads(self.rfile.read(length))])
+                    self.send_response(200)
+                except (ValueError, KeyError) as e:
+                    logging.warning(f"Rejected malformed webhook update: {e}")
+                    self.send_response(400)
+                self.end_headers()
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), WebhookHandler)
+        threading.Thread(target=server.serve_forever, name="Webhook", daemon=True).start()
+        logging.info(f"Ingress listening for webhook updates on {host}:{port}.")
+        return server
+
+    def stop(self, timeout:float = 30) -> None:
+        """Stop routing updates and let every worker finish what it has queued."""
+        self._stopping.set()
+        for queue in self._queues:
+            queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        logging.info(f"Stopped {self.worker_count} worker processes after routing {sum(self.routed)} updates.")
@@ -0,0 +1,55 @@
+import threading
+
+from constants import CachedStatus, OrderStatus, StatusChange
+from models import Database
+from typing import Optional
+
+
+class OrderStatusCache:
+    """
+    Status of each chat's latest order, kept current by the database's status listeners.
+
+    A chat is looked up in the database once, every later /status is a dictionary
+    read. When other processes share the database, entries are only trusted until
+    one of them commits.
+    """
+
+    def __init__(self, db:Database) -> None:
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, CachedStatus] = {}
+        self._lock = threading.Lock()
+        db.add_status_listener(self.on_status_change)
+
+    def on_status_change(self, change:StatusChange) -> None:
+        chat_id = str(change.chat_id)
+        version = self.db.external_version
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry.order_id is None or change.order_id >= entry.order_id:
+                self._entries[chat_id] = CachedStatus(change.order_id, change.status, version)
+
+    def get(self, chat_id:int) -> Optional[OrderStatus]:
+        """Return the status of the chat's latest order, or None if it never ordered."""
+        return self.latest(chat_id).status
+
+    def latest(self, chat_id:int) -> CachedStatus:
+        """Return the id and status of the chat's latest order, both None if it never ordered."""
+        chat_id = str(chat_id)
+        version = self.db.external_version
+        with self._lock:
+            entry = self._entries.get(chat_id)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        latest = self.db.get_latest_order_status_by_chat_id(chat_id)
+        order_id, status = latest if latest else (None, None)
+        fresh = CachedStatus(order_id, status, version)
+        with self._lock:
+            # Keep a newer status a listener stored while we were reading
+            if self._entries.get(chat_id) is entry:
+                self._entries[chat_id] = fresh
+        return fresh
@@ -1,4 +1,9 @@
-from constants import Order, OrderDetail, OrderItem, OrderStatus, MenuItem
+import hashlib
+import json
+import time
+
+from constants import Order, OrderDetail, OrderExportRow, OrderItem, OrderStatus, MenuItem, StatusDuration, StatusWindow
+from typing import Optional
 
 def sanitise_username(username:str) -> str:
     """Escape underscores from usernames for markdown."""
@@ -19,6 +24,58 @@ def status_transition(status:OrderStatus) -> OrderStatus:
     }
     return STATUS_TRANSITIONS.get(status, [])
 
+def menu_items_version(items:list[tuple[str, int, float]]) -> str:
+    """Fingerprint a menu definition so unchanged menus are not re-seeded."""
+    return hashlib.sha1(json.dumps(items, sort_keys=True).encode()).hexdigest()
+
+
+class PhaseTimer:
+    """Record how long consecutive phases of a process take."""
+
+    def __init__(self) -> None:
+        self.started_at = self.last_mark = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, phase:str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+    def total(self) -> float:
+        return self.last_mark - self.started_at
+
+    def report(self) -> str:
+        return ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in self.phases)
+
+def format_duration(seconds:float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}m{seconds:02d}s"
+
+def format_order_stats(durations:list[StatusDuration], windows:list[StatusWindow], max_windows:Optional[int] = None) -> str:
+    """Summarise time in each status and the orders entering each status per window as plain text."""
+    lines = ["Time in status (p50 / p90 / p95 / max)"]
+    for duration in durations:
+        lines.append(
+            f"{duration.status.display()} ({duration.orders} orders): "
+            f"{format_duration(duration.p50_seconds)} / {format_duration(duration.p90_seconds)} / "
+            f"{format_duration(duration.p95_seconds)} / {format_duration(duration.max_seconds)}"
+        )
+    if not durations:
+        lines.append("No completed transitions yet.")
+
+    counts = {}
+    for window in windows:
+        counts.setdefault(window.window_start, []).append(f"{window.status.display()} {window.orders}")
+    starts = list(counts)[-max_windows:] if max_windows else list(counts)
+
+    lines.append("")
+    lines.append("Orders entering each status per window")
+    for start in starts:
+        lines.append(f"{start}: {', '.join(counts[start])}")
+    if not starts:
+        lines.append("No orders yet.")
+    return "\n".join(lines)
+
 # Type casting functions
 def cast_to_menu_item(row) -> MenuItem:
     return MenuItem(
@@ -50,4 +107,35 @@ def cast_to_order_detail(row) -> OrderDetail:
         customer_name=row[1],
         status=getattr(OrderStatus, row[2], None),
         order_contents=row[3]
+    )
+
+def cast_to_order_export_row(row) -> OrderExportRow:
+    return OrderExportRow(
+        order_id=int(row[0]),
+        customer_name=row[1],
+        customer_chat_id=row[2],
+        status=getattr(OrderStatus, row[3], None),
+        created_at=row[4],
+        item_name=row[5],
+        quantity=int(row[6]),
+        price=float(row[7]),
+        line_total=float(row[8]),
+        order_total=float(row[9])
+    )
+
+def cast_to_status_duration(row) -> StatusDuration:
+    return StatusDuration(
+        status=getattr(OrderStatus, row[0], None),
+        orders=int(row[1]),
+        p50_seconds=float(row[2]),
+        p90_seconds=float(row[3]),
+        p95_seconds=float(row[4]),
+        max_seconds=float(row[5])
+    )
+
+def cast_to_status_window(row) -> StatusWindow:
+    return StatusWindow(
+        window_start=row[0],
+        status=getattr(OrderStatus, row[1], None),
+        orders=int(row[2])
     )
\ No newline at end of file